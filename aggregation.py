@@ -0,0 +1,149 @@
+import math
+
+from scipy.stats import t
+
+"""
+    Online statistics to aggregate the replications of a scenario.
+    Each replication is added to the statistics as soon as it finishes and then discarded, so the memory used depends
+    on the amount of metrics and names, not on the amount of replications.
+"""
+
+
+class OnlineStats(object):
+    """ Count, sum, mean, variance (Welford's algorithm), minimum and maximum of a stream of values. """
+    __slots__ = ('count', 'total', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def variance(self):
+        # Sample variance, nan with less than 2 values
+        if self.count < 2:
+            return math.nan
+        return self.m2 / (self.count - 1)
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def sem(self):
+        # Standard error of the mean
+        return math.sqrt(self.variance() / self.count)
+
+    def half_width(self, confidence=0.95):
+        # Half width of the Student-t confidence interval of the mean
+        return self.sem() * t.ppf((1 + confidence) / 2, self.count - 1)
+
+    def relative_half_width(self, confidence=0.95):
+        # Half width of the confidence interval relative to the mean, inf if the mean is 0
+        if self.mean == 0:
+            return math.inf
+        return abs(self.half_width(confidence) / self.mean)
+
+    def __repr__(self):
+        return "n: {}, mean: {}, std: {}, min: {}, max: {}".format(self.count, self.mean, self.std(), self.min,
+                                                                  self.max)
+
+
+class Aggregator(object):
+    """ OnlineStats keyed by metric and name (a content name, a node...). """
+    def __init__(self):
+        self.metrics = dict()  # Dict of OnlineStats by name, for each metric
+
+    def add(self, metric, value, name=None):
+        stats = self.metrics.setdefault(metric, dict())
+        if name not in stats:
+            stats[name] = OnlineStats()
+        stats[name].add(value)
+
+    def update(self, metric, values):
+        # Adds the dict of (name, value) @values to @metric
+        for name, value in values.items():
+            self.add(metric, value, name)
+
+    def get(self, metric, name=None):
+        return self.metrics[metric][name]
+
+    def names(self, metric):
+        # Names of @metric, in order of appearance
+        return list(self.metrics.get(metric, ()))
+
+    def __contains__(self, metric):
+        return metric in self.metrics
+
+    def summary(self, metric, attribute):
+        # Returns a dict with @attribute (count, total, mean, min, max) of each name of @metric
+        return {name: getattr(stats, attribute) for name, stats in self.metrics.get(metric, {}).items()}
+
+    def means(self, metric):
+        return self.summary(metric, 'mean')
+
+    def totals(self, metric):
+        return self.summary(metric, 'total')
+
+    def maxima(self, metric):
+        return self.summary(metric, 'max')
+
+    def half_widths(self, metric, confidence=0.95):
+        return {name: stats.half_width(confidence) for name, stats in self.metrics.get(metric, {}).items()}
+
+
+class TargetPrecision(object):
+    """ Stopping rule for a campaign: the confidence intervals of some metrics are narrow enough.
+
+        Parameters
+        ----------
+        targets : dict
+            (Aggregator, metric) to check for each label, all the names of the metric are checked
+        precision : float
+            maximum half width of the confidence intervals, relative to their mean
+        confidence : float
+            confidence of the intervals
+        minimum : int
+            replications run before checking the intervals
+    """
+    def __init__(self, targets, precision=0.05, confidence=0.95, minimum=10):
+        self.targets = targets
+        self.precision = precision
+        self.confidence = confidence
+        self.minimum = minimum
+        self.count = 0  # Replications checked
+        self.worst = (math.inf, None, None)  # Widest relative half width, its label and name
+
+    def achieved(self):
+        # Returns a dict with the relative half width of every (label, name) checked
+        return {(label, name): stats.relative_half_width(self.confidence)
+                for label, (aggregator, metric) in self.targets.items()
+                for name, stats in aggregator.metrics.get(metric, {}).items()}
+
+    def __call__(self, count):
+        self.count = count
+        if count < self.minimum:
+            return False
+        self.worst = (math.inf, None, None)
+        for (label, name), width in self.achieved().items():
+            if math.isnan(width):  # A name with a single value is not narrow enough
+                width = math.inf
+            if self.worst[1] is None or width > self.worst[0]:
+                self.worst = (width, label, name)
+        return self.worst[0] <= self.precision
+
+    def report(self):
+        width, label, name = self.worst
+        return "Replications: {}, widest relative half width: {:.4f} ({} {}), target: {}".\
+            format(self.count, width, label, name, self.precision)
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+
+"""
+    Eviction policies of a bounded Content Store.
+    A policy only keeps the names of the evictable entries in some order, the Content Store keeps the entries. It is
+    told about every entry added, used and removed, and asked for the name to evict when the store is full. A name
+    missed is admitted before the evictions that make room for it, and inserted after them. All the
+    operations cost O(1), but LFU looking for its new lowest frequency, which goes through the frequencies in use.
+"""
+
+
+class LRU(object):
+    """ Least recently used. """
+    def __init__(self):
+        self.names = OrderedDict()  # From the least to the most recently used
+
+    def __len__(self):
+        return len(self.names)
+
+    def admit(self, name):
+        # @name is going to be inserted, called before making room for it
+        pass
+
+    def insert(self, name):
+        self.names[name] = None
+
+    def hit(self, name):
+        self.names.move_to_end(name)
+
+    def remove(self, name):
+        self.names.pop(name, None)
+
+    def evict(self, incoming=None):
+        # Returns the name to evict to make room for @incoming, and forgets it
+        return self.names.popitem(last=False)[0]
+
+
+class LFU(object):
+    """ Least frequently used, the least recently used among the ones with the same frequency. """
+    def __init__(self):
+        self.frequency = dict()  # Uses of each name
+        self.buckets = dict()  # Names with each frequency, from the least to the most recently used
+        self.lowest = 0  # Lowest frequency with names
+
+    def __len__(self):
+        return len(self.frequency)
+
+    def admit(self, name):
+        pass
+
+    def insert(self, name):
+        self.frequency[name] = 1
+        self.buckets.setdefault(1, OrderedDict())[name] = None
+        self.lowest = 1
+
+    def hit(self, name):
+        frequency = self.frequency[name]
+        bucket = self.buckets[frequency]
+        del bucket[name]
+        if not bucket:
+            del self.buckets[frequency]
+            if self.lowest == frequency:
+                self.lowest = frequency + 1
+        self.frequency[name] = frequency + 1
+        self.buckets.setdefault(frequency + 1, OrderedDict())[name] = None
+
+    def remove(self, name):
+        frequency = self.frequency.pop(name, None)
+        if frequency is None:
+            return
+        bucket = self.buckets[frequency]
+        del bucket[name]
+        if not bucket:
+            del self.buckets[frequency]
+            if self.lowest == frequency:
+                self.lowest = min(self.buckets, default=0)
+
+    def evict(self, incoming=None):
+        bucket = self.buckets[self.lowest]
+        name = bucket.popitem(last=False)[0]
+        del self.frequency[name]
+        if not bucket:
+            del self.buckets[self.lowest]
+            self.lowest = min(self.buckets, default=0)
+        return name
+
+
+class ARC(object):
+    """ Adaptive replacement cache (Megiddo and Modha).
+
+        The entries used once (recent) and the ones used more than once (frequent) are kept apart, along with the
+        names recently evicted from each list (ghosts). A miss on a ghost moves the target size of the recent list
+        towards the list it was evicted from.
+
+        Parameters
+        ----------
+        capacity : int
+            entries of the store, if None (a store bounded in bytes) the most entries it has held so far
+    """
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.recent = OrderedDict()  # T1, from the least to the most recently used
+        self.frequent = OrderedDict()  # T2
+        self.recent_ghosts = OrderedDict()  # B1
+        self.frequent_ghosts = OrderedDict()  # B2
+        self.target = 0.0  # Target size of the recent list, p
+        self.admitted = None  # Name being admitted after a miss on a ghost, it goes to the frequent list
+        self.ghost = None  # Ghost list it was found in
+        self.largest = 0  # Most entries held so far
+
+    def __len__(self):
+        return len(self.recent) + len(self.frequent)
+
+    def _size(self):
+        if self.capacity is None:
+            return max(self.largest, 1)
+        return self.capacity
+
+    def admit(self, name):
+        # A miss on a ghost adapts the target before the evictions that make room for @name
+        size = self._size()
+        self.admitted = None
+        self.ghost = None
+        if name in self.recent_ghosts:
+            # Evicted from the recent list too early
+            self.target = min(size, self.target + max(len(self.frequent_ghosts) / len(self.recent_ghosts), 1))
+            del self.recent_ghosts[name]
+            self.admitted = name
+            self.ghost = self.recent_ghosts
+        elif name in self.frequent_ghosts:
+            self.target = max(0.0, self.target - max(len(self.recent_ghosts) / len(self.frequent_ghosts), 1))
+            del self.frequent_ghosts[name]
+            self.admitted = name
+            self.ghost = self.frequent_ghosts
+
+    def insert(self, name):
+        if name == self.admitted:
+            self.frequent[name] = None
+        else:
+            self.recent[name] = None
+        self.largest = max(self.largest, len(self))
+        self.admitted = None
+        self.ghost = None
+
+    def hit(self, name):
+        if name in self.recent:
+            del self.recent[name]
+        else:
+            del self.frequent[name]
+        self.frequent[name] = None
+
+    def remove(self, name):
+        self.recent.pop(name, None)
+        self.frequent.pop(name, None)
+
+    def evict(self, incoming=None):
+        # REPLACE, with the target already adapted by admit()
+        from_frequent = incoming is not None and incoming == self.admitted and self.ghost is self.frequent_ghosts
+        if self.recent and (len(self.recent) > self.target or (from_frequent and len(self.recent) == self.target)):
+            name = self.recent.popitem(last=False)[0]
+            self.recent_ghosts[name] = None
+        elif self.frequent:
+            name = self.frequent.popitem(last=False)[0]
+            self.frequent_ghosts[name] = None
+        else:
+            name = self.recent.popitem(last=False)[0]
+            self.recent_ghosts[name] = None
+        # The recent list and its ghosts are limited to the size of the store, all the lists to twice that size
+        size = self._size()
+        while self.recent_ghosts and len(self.recent) + len(self.recent_ghosts) > size:
+            self.recent_ghosts.popitem(last=False)
+        while self.frequent_ghosts and len(self) + len(self.recent_ghosts) + len(self.frequent_ghosts) > 2 * size:
+            self.frequent_ghosts.popitem(last=False)
+        return name
+
+
+POLICIES = {'lru': LRU, 'lfu': LFU, 'arc': ARC}
@@ -0,0 +1,143 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import sys
+import traceback
+
+"""
+    Helpers to run the replications of a scenario in parallel.
+    Every replication is a call to a module level function (so it can be pickled and sent to the workers) which
+    seeds its own random generator and returns a compact result object. The results are given back in the same order
+    as the tasks were submitted, so the reduction done by the scenario is the same as in a sequential run.
+"""
+
+
+def run_sequential(simulate, replication, fold, converged, maximum, processes=None, batch=None, state=None):
+    """ Runs replications until converged() or until @maximum of them have been run, returns the amount run.
+
+        The replications are run in batches, their results folded in replication order after each one and then the
+        stopping rule is checked, so the results do not depend on the amount of processes.
+
+        Parameters
+        ----------
+        simulate : function
+            module level function running one simulation
+        replication : function
+            replication(i) returns the list of argument tuples of the simulations of replication i (i.e. one per mode)
+        fold : function
+            called with the result of every simulation, in order
+        converged : function
+            converged(count) returns True when the @count replications folded so far are enough
+        maximum : int
+            maximum amount of replications
+        processes : int
+            number of worker processes, None uses all the cores and 1 runs everything in this process
+        batch : int
+            replications run between two checks of the stopping rule, by default one per process
+        state : object
+            if given, every simulation is run as simulate(state, *task) in a child forked from this process, see
+            imap_forked()
+    """
+    if batch is None:
+        batch = 1 if processes == 1 else (processes or multiprocessing.cpu_count())
+    count = 0
+    pool = multiprocessing.Pool(processes) if processes != 1 and state is None else None
+    try:
+        while count < maximum:
+            amount = min(batch, maximum - count)
+            tasks = [task for i in range(count, count + amount) for task in replication(i)]
+            if state is not None:
+                results = imap_forked(simulate, state, tasks, processes)
+            elif pool is None or len(tasks) < 2:
+                results = (simulate(*task) for task in tasks)
+            else:
+                results = pool.imap(_Call(simulate), tasks, chunksize=1)
+            for result in results:
+                fold(result)
+            count += amount
+            if converged(count):
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return count
+
+
+def imap_forked(simulate, state, tasks, processes=None):
+    """ Runs ``simulate(state, *task)`` for every task, each one in a child process forked from this one, and yields
+        the results in task order.
+
+        The children get a copy on write of @state as it is in this process, i.e. a network already warmed up, so
+        every replication starts from the same state without building it again. Only available where os.fork() is.
+
+        Parameters
+        ----------
+        simulate : function
+            function running one replication from @state, it can change its copy of @state
+        state : object
+            state shared by all the replications, it is never changed in this process
+        tasks : list
+            list of argument tuples, one per replication
+        processes : int
+            number of children running at the same time, None uses all the cores
+    """
+    tasks = list(tasks)
+    processes = processes or multiprocessing.cpu_count()
+    children = dict()  # Pipe the result of each running task is read from, by task index
+    results = dict()  # Results received before the ones of the previous tasks
+    started = 0
+    following = 0  # Next result to yield
+    while following < len(tasks):
+        while started < len(tasks) and len(children) < processes:
+            children[started] = _fork(simulate, state, tasks[started])
+            started += 1
+        for pipe in multiprocessing.connection.wait([pid_pipe[1] for pid_pipe in children.values()]):
+            index = next(i for i, (pid, each) in children.items() if each is pipe)
+            pid, pipe = children.pop(index)
+            data = pipe.read()
+            pipe.close()
+            os.waitpid(pid, 0)
+            done, result = pickle.loads(data) if data else (False, 'the replication process died')
+            if not done:
+                for pid, each in children.values():
+                    os.kill(pid, 9)
+                    os.waitpid(pid, 0)
+                    each.close()
+                raise RuntimeError("Replication {} failed:\n{}".format(tasks[index], result))
+            results[index] = result
+        while following in results:
+            yield results.pop(following)
+            following += 1
+
+
+def _fork(simulate, state, task):
+    # Starts a child running simulate(state, *task), returns its pid and the pipe its pickled result is read from
+    read, write = os.pipe()
+    # The child gets a copy of the output buffered here, it would print it again when it flushes its own
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        try:
+            data = pickle.dumps((True, simulate(state, *task)))
+        except BaseException:
+            data = pickle.dumps((False, traceback.format_exc()))
+        with os.fdopen(write, 'wb') as pipe:
+            pipe.write(data)
+        # os._exit() does not flush, what the replication printed would be lost
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
+    os.close(write)
+    return pid, os.fdopen(read, 'rb')
+
+
+class _Call(object):
+    # Picklable wrapper unpacking the task arguments, Pool.imap only passes one argument
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, task):
+        return self.function(*task)
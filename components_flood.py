@@ -1,10 +1,19 @@
-import copy
+import heapq
+import math
 
+import numpy as np
 import simpy
-import random
 import string
 import functools
 
+from caching import POLICIES
+from filters import recent_filter
+from metrics import Metrics
+from names import NameTrie, registry
+from sampling import WeightedSampler, sample_weights
+from streams import shared
+from timers import TimerWheel
+
 """
     In this library the data is transmitted. That means using Content Store to use in-network storage.
     Now the ants need to check whether the data is in the CS, and if so, they need to create a Data packet as a response.
@@ -16,6 +25,8 @@ class Packet(object):
         This packet will run through a queue at a switch output port.
         We use a float to represent the size of the packet in bytes so that
         we can compare to ideal M/M/1 queues.
+        Copies made with copy() share the header (name, creator, size, data) and the hops already in the trail, only
+        the fields changed hop by hop are set on each copy.
 
         Parameters
         ----------
@@ -25,9 +36,11 @@ class Packet(object):
             the size of the packet in bytes
         ant_id : int
             an identifier for the packet
-        name : string
-            name of the content requested
+        name : int
+            id of the name of the content requested, in the name registry
     """
+    __slots__ = ('creator', 'time', 'size', 'name', 'mode', 'data', 'id', 'ant', 'lifetime', 'default_time', 'hops')
+
     def __init__(self, creator, time, size, name, lifetime, p_id, ant=False, data=None):
         self.creator = creator
         self.time = time
@@ -39,11 +52,12 @@ class Packet(object):
         self.ant = ant
         self.lifetime = lifetime
         self.default_time = lifetime
-        self.trail = []
+        self.hops = None  # Last hop of the trail, as (hop, previous hops), shared with the copies made before it
 
     def __repr__(self):
         return "name: {}, id: {}, ant: {} time: {}, life: {}, size: {}, mode:{}, creator: {}, data: {}".\
-            format(self.name, self.id, self.ant, self.time, self.lifetime, self.size, self.mode, self.creator,  self.data)
+            format(registry.name(self.name), self.id, self.ant, self.time, self.lifetime, self.size, self.mode,
+                   self.creator,  self.data)
 
     def __lt__(self, other):
         return self.mode > other.mode or (self.mode == other.mode and self.id < other.id)
@@ -51,39 +65,76 @@ class Packet(object):
     def add_data(self, data):
         self.data = data
 
+    def add_hop(self, name, time):
+        self.hops = ((name, time), self.hops)
+
+    @property
+    def trail(self):
+        # List of (node name, time) the packet went through, from the first one
+        trail = []
+        hops = self.hops
+        while hops is not None:
+            trail.append(hops[0])
+            hops = hops[1]
+        trail.reverse()
+        return trail
+
+    def copy(self):
+        # Returns a copy of the packet, the data and the trail are shared instead of copied
+        pkt = Packet.__new__(Packet)
+        pkt.creator = self.creator
+        pkt.time = self.time
+        pkt.size = self.size
+        pkt.name = self.name
+        pkt.mode = self.mode
+        pkt.data = self.data
+        pkt.id = self.id
+        pkt.ant = self.ant
+        pkt.lifetime = self.lifetime
+        pkt.default_time = self.default_time
+        pkt.hops = self.hops
+        return pkt
+
 
 class Consumer(object):
-    def __init__(self, env, name, delay=0, mode=0):
+    def __init__(self, env, name, delay=0, mode=0, streams=None):
         self.name = name
         self.mode = mode # 0 = Ant routing, 1 = flooding
         self.env = env
         self.delay = delay
-        self.id = random.randrange(9999999)
+        # Random streams of the Consumer, taken from the ones of the replication
+        self.streams = (streams if streams is not None else shared).component(name)
+        self.id = self.streams.workload.randrange(9999999)
         self.interface = None
         self.store = simpy.Store(env)  # The queue of pkts in the internal process
         self.action = env.process(self.run())  # starts the run() method as a SimPy process
         self.receivedPackets = dict()
-        self.wastedPackets = list()
+        self.metrics = Metrics()  # Counters of the packets lost, read by the scenarios
+        self.wastedPackets = self.metrics.counter('wasted')
         self.sentPackets = list()
         self.lifetime = 100
         self.received = []
+        self.active = 0  # Request processes running
 
     def request(self, name, delay=0):
         # TODO It will generate packets in a specified interval
         # It will send 10 ants to form a path and
         # once the first one arrived back in a form of Data packet it will send the Data request
+        self.active += 1
+        name = registry.intern(name)
         yield self.env.timeout(self.delay+delay)  # Wait to start requesting packets
         if self.mode == 0:  # If using ant routing we send ants to explore
             for i in range(20):
                 yield self.env.timeout(0.1)  # generate packets at fix speed
-                pkt = Packet(self.name, self.env.now, random.randint(50, 100), name, self.lifetime, self.id, True)
+                pkt = Packet(self.name, self.env.now, self.streams.ants.randint(50, 100), name, self.lifetime, self.id, True)
                 self.id += 1
                 self.interface.packets.put(pkt)
-        data = Packet(self.name, self.env.now, random.randint(1500, 2000), name, self.lifetime, self.id)
+        data = Packet(self.name, self.env.now, self.streams.sizes.randint(1500, 2000), name, self.lifetime, self.id)
         self.id += 1
-        pkt_c = copy.deepcopy(data)
+        pkt_c = data.copy()
         self.sentPackets.append(pkt_c)
         self.interface.packets.put(data)
+        self.active -= 1
 
     def run(self):
         # It will listen for packets in the store to process
@@ -99,11 +150,11 @@ class Consumer(object):
             else:
                 pkt.time = self.env.now - pkt.time
                 if pkt.data is not None:
-                    pkt.trail.append((self.name, self.env.now))
-                    pkt_c = copy.deepcopy(pkt)
+                    pkt.add_hop(self.name, self.env.now)
+                    pkt_c = pkt.copy()
                     self.received.append(pkt_c)
                     if pkt.name in self.receivedPackets:
-                        self.wastedPackets.append(pkt_c)
+                        self.wastedPackets.add(pkt_c)
                     elif isinstance(pkt.data, list):
                         self.receivedPackets[pkt.name] = pkt_c
                         self.env.process(self.request_chunks(pkt.data))
@@ -115,28 +166,35 @@ class Consumer(object):
     def add_interface(self, iface):
         self.interface = iface
 
+    def outstanding(self):
+        # Returns the names requested that have not been received
+        return {pkt.name for pkt in self.sentPackets if pkt.name not in self.receivedPackets}
+
     def request_chunks(self, data):
         # It will listen for packets in the store to process
+        self.active += 1
         for name, i in zip(data, range(len(data))):
             if self.mode == 0:  # If using ant routing we send ants to explore
                 for j in range(10):
                     yield self.env.timeout(0.1)
-                    pkt = Packet(self.name, self.env.now, random.randint(50, 100), name, self.lifetime, self.id, True)
+                    pkt = Packet(self.name, self.env.now, self.streams.ants.randint(50, 100), name, self.lifetime, self.id, True)
                     self.id += 1
                     self.interface.packets.put(pkt)
             if i > 2:
                 yield self.env.timeout(3)
-            pkt = Packet(self.name, self.env.now, random.randint(1500, 2000), name, self.lifetime, self.id)
+            pkt = Packet(self.name, self.env.now, self.streams.sizes.randint(1500, 2000), name, self.lifetime, self.id)
             self.sentPackets.append(pkt)
             self.id += 1
             self.interface.packets.put(pkt)
+        self.active -= 1
 
 
 class Producer(object):
-    def __init__(self, env, names, name, area):
+    def __init__(self, env, names, name, area, streams=None):
         self.name = name
         self.env = env
         self.area = area
+        self.streams = (streams if streams is not None else shared).component(name)
         self.interface = None
         self.store = simpy.Store(env)  # The queue of pkts in the internal process
         self.data = dict()  # List with the data names of the producer
@@ -144,17 +202,18 @@ class Producer(object):
             self.create_data(_name)
         self.action = env.process(self.listen())
         self.received = set()
-        self.wasted = []
+        self.metrics = Metrics()
+        self.wasted = self.metrics.counter('wasted')
 
     def create_data(self, name):
         chunks = dict()
         # Create 10 chunks of data from a specific content name
         chunks_names = ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10']
         for i in chunks_names:
-            chunk_name = str(self.area) + "/" + str(name) + "/" + i
+            chunk_name = registry.intern(str(self.area) + "/" + str(name) + "/" + i)
             # Create some random data of size 10 bits
-            chunks[chunk_name] = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-        self.data[str(self.area) + "/" + str(name)] = chunks
+            chunks[chunk_name] = ''.join(self.streams.workload.choices(string.ascii_uppercase + string.digits, k=10))
+        self.data[registry.intern(str(self.area) + "/" + str(name))] = chunks
 
     def listen(self):
         # It will listen for packets in the store to process
@@ -164,16 +223,16 @@ class Producer(object):
             pkt = item[0]
             # It receive an Interest packet and creates the Data packet for it
             if pkt.mode == 0:
-                gen_name = ''  # Initialize a general name from the content
-                if pkt.name.count('/') > 1:
-                    # To avoid a possible error we first treat the string to be used in the if statement
-                    gen_name = pkt.name.rsplit('/', 1)[0]
+                gen_name = -1  # Initialize a general name from the content
+                if registry.depth(pkt.name) > 2:
+                    # The general name is the chunk name without its last component
+                    gen_name = registry.parents[pkt.name]
                 # The content name is the general one
                 if pkt.name in self.data:
                     if not pkt.ant:
                         self.received.add(pkt.name)
                         pkt.add_data(list(self.data[pkt.name].keys()))
-                        pkt.trail.append((self.name, self.env.now))
+                        pkt.add_hop(self.name, self.env.now)
                         pkt.creator = self.name
                     pkt.lifetime = pkt.default_time
                     pkt.mode = 1  # Convert the Interest packet in Data packet
@@ -182,14 +241,14 @@ class Producer(object):
                     if not pkt.ant:
                         self.received.add(pkt.name)
                         pkt.add_data(self.data[gen_name][pkt.name])
-                        pkt.trail.append((self.name, self.env.now))
+                        pkt.add_hop(self.name, self.env.now)
                         pkt.creator = self.name
                     pkt.lifetime = pkt.default_time
                     pkt.mode = 1  # Convert the Interest packet in Data packet
                 # If the content is there the packet is modified to Data, else it is returned as it is
                 iface.packets.put(pkt)
             else:
-                self.wasted.append(pkt)
+                self.wasted.add(pkt)
                 print("Error - Producer received Data packet")
 
     def add_interface(self, iface):
@@ -197,10 +256,15 @@ class Producer(object):
 
 
 class Node(object):
-    def __init__(self, env, nid, name, area, mode=0):
+    def __init__(self, env, nid, name, area, mode=0, fib='dict', arena=None, streams=None, bootstrap='ants',
+                 cs=None, recent=None):
         # It is the constant for which the pheromones will be reduced each time
         self.env = env
+        # Random streams of the Node, taken from the ones of the replication
+        self.streams = (streams if streams is not None else shared).component(name)
+        self.forwarding = self.streams.forwarding
         self.mode = mode  # 0 is Ant routing, 1 is flood routing
+        self.bootstrap = bootstrap  # 'ants' sends area ants on start, 'shortest' waits for populate() to be called
         self.id = nid
         self.name = name
         self.area = area
@@ -209,28 +273,49 @@ class Node(object):
                       'Osterdalen', 'Sandnessjoen', 'Forde-Volda', 'Bergen', 'Trondheim', 'Bodo',
                       'Buskerud og Vestfold', 'Volda', 'Telemark', 'Alesund', 'Ostfold', 'Mo', 'Nesna', 'Narvik',
                       'Tromso', 'Harstad', 'Karasjok', 'Kjeller', 'Molde', 'NLH As', 'kristiansand']
-        self.pkt_id = random.randrange(9999999)
+        self.pkt_id = self.streams.workload.randrange(9999999)
         self.reduce_const = 0.05  # TODO Assign it properly
         self.pheromone = 1.5
         self.store = simpy.PriorityStore(env)  # The queue of pkts in the node
         self.interfaces = list()
         self.timeout = 1500  # TODO Assign it properly  # It is the time to live in the table
+        self.dist = functools.partial(self.streams.evaporation.expovariate, 1.0)
+        self.arena = arena
+        if arena is not None:  # The evaporation ticks are the ones of the whole network
+            self.clock = arena.clock
+        else:
+            self.clock = Evaporation(self.dist)  # Ticks where pheromones evaporate and PAT-PIT entries age
+        self.idle = None  # Event the evaporate process waits for while the PAT and PIT are empty
+        self.timers = TimerWheel()  # Expiry of the PAT and PIT entries, in evaporation ticks
         self.PAT = PAT()
         self.PIT = PIT()
-        self.FIB = FIB()
-        self.CS = CS()
-        self.CS.table[area] = CSobject(area, None, 0, self.name)
+        if arena is not None:  # Pheromones in the array of the whole network
+            self.FIB = arena.register(self.interfaces)
+        elif fib == 'matrix':  # Pheromones of all the entries in a single array
+            self.FIB = MatrixFIB(env, self.clock, self.reduce_const, self.interfaces)
+        else:
+            self.FIB = FIB(env, self.clock, self.reduce_const)
+        self.metrics = Metrics()  # Counters of the packets lost, dropped and served
+        # @cs are the keyword arguments of the CS (capacity, policy, unit), unbounded by default
+        self.CS = CS(env, metrics=self.metrics, **(cs or {}))
+        self.CS.pin(CSobject(registry.intern(area), None, 0, self.name))  # The area entry is never evicted
         self.action = env.process(self.run())  # starts the run() method as a SimPy process
         self.action2 = env.process(self.evaporate())  # starts the run() method as a SimPy process
-        self.dist = functools.partial(random.expovariate, 1.0)
-        self.wastedPackets = []
-        self.timeouts = dict()
-        self.timeoutPackets = []
-        self.interestDrop = []
-        self.servedData = []
+        self.wastedPackets = self.metrics.counter('wasted')
+        # Names whose PIT entry timed out recently, @recent are the keyword arguments of filters.recent_filter()
+        self.timeouts = recent_filter(env, **(recent or {}))
+        self.timeoutPackets = self.metrics.counter('timeout')
+        self.interestDrop = self.metrics.counter('interest_drop')
+        self.servedData = self.metrics.counter('served')
+        # Size of the tables, sampled by the NodeMonitor
+        self.metrics.gauge('pat', self.PAT.__len__)
+        self.metrics.gauge('pit', self.PIT.__len__)
+        self.metrics.gauge('cs', self.CS.__len__)
+        self.metrics.gauge('fib', self.FIB.__len__)
+        self.metrics.gauge('timeouts_bytes', lambda: self.timeouts.nbytes)
 
     def run(self):
-        if self.mode == 0:
+        if self.mode == 0 and self.bootstrap == 'ants':
             self.env.process(self.prepare())
         while True:
             item = (yield self.store.get())
@@ -242,77 +327,82 @@ class Node(object):
                     # Here ant packets process
                     # Check CS for data objects
                     # If the data is in the CS create Data packet and return it
-                    if pkt.name in self.CS.table:
+                    cached = self.CS.probe(pkt.name)
+                    if cached is not None:
                         pkt.lifetime = pkt.default_time
                         pkt.mode = 1  # Convert the Interest packet in Data packet
-                        self.CS.table[pkt.name].lifetime = self.timeout
+                        self.CS.refresh(cached, self.timeout)
                         iface.packets.put(pkt)
                     else:
                         # Just save the first interface the packet come from, avoiding further loops
                         if pkt.id not in self.PAT.table:
-                            entry = PATobject(pkt.id, pkt.name, iface, self.timeout)
+                            entry = PATobject(pkt.id, pkt.name, iface, self.schedule(self.expire_pat, pkt.id))
                             self.PAT.table[pkt.id] = entry  # Add the Interest packet
                         out_iface = self.forward_engine(pkt)  # The ForwardEngine decides outgoing interface
                         out_iface.packets.put(pkt)  # The packet is sent to the out iface
                 elif pkt.mode == 0 and not pkt.ant:
                     # Here content packets are processed
                     # Check CS for data objects
-                    if pkt.name in self.CS.table:
-                        pkt.add_data(self.CS.table[pkt.name].data)  # Add data to the packet
-                        pkt.trail.append((self.name, self.env.now))
-                        pkt.creator = self.CS.table[pkt.name].producer
+                    cached = self.CS.get(pkt.name)
+                    if cached is not None:
+                        pkt.add_data(cached.data)  # Add data to the packet
+                        pkt.add_hop(self.name, self.env.now)
+                        pkt.creator = cached.producer
                         pkt.lifetime = pkt.default_time
                         pkt.mode = 1  # Convert the Interest packet in Data packet
-                        self.CS.table[pkt.name].lifetime = self.timeout
+                        self.CS.refresh(cached, self.timeout)
                         iface.packets.put(pkt)
                     elif self.mode == 0:  # Ant routing
                         if pkt.name in self.PIT.table:
                             if pkt.id in self.PIT.table[pkt.name].ids:
                                 if iface not in self.PIT.table[pkt.name].incoming:
-                                    self.PIT.table[pkt.name].incoming[iface] = self.timeout
+                                    self.PIT.attach(pkt.name, iface, self.schedule(self.expire_pit, (pkt.name, iface)))
                                 out_iface = list(self.PIT.table[pkt.name].incoming.keys())
                                 if iface not in out_iface:
                                     out_iface.append(iface)
-                                if len(out_iface) < len(self.interfaces):
-                                    while iface in out_iface:
-                                        iface = self.forward_engine(pkt)  # The ForwardEngine decides outgoing interface
+                                # The ForwardEngine decides among the interfaces the packet has not come from
+                                iface = self.forward_engine(pkt, out_iface)
+                                if iface is not None:
                                     iface.packets.put(pkt)  # The packet is sent to the out iface
                                 else:
-                                    self.interestDrop.append(pkt)
+                                    self.interestDrop.add(pkt)
                             else:
-                                self.PIT.table[pkt.name].incoming[iface] = self.timeout
+                                self.PIT.attach(pkt.name, iface, self.schedule(self.expire_pit, (pkt.name, iface)))
                                 self.PIT.table[pkt.name].ids.append(pkt.id)
                         else:
                             # Create entry in the PIT table for the Interest packet
-                            self.PIT.table[pkt.name] = PITobject(pkt.name, pkt.id, iface, self.timeout)
-                            out_iface = iface
-                            while out_iface is iface:
-                                out_iface = self.forward_engine(pkt)  # The ForwardEngine decides outgoing interface
-                            out_iface.packets.put(pkt)  # The packet is sent to the out iface
+                            self.PIT.add(PITobject(pkt.name, pkt.id, iface,
+                                                   self.schedule(self.expire_pit, (pkt.name, iface))))
+                            out_iface = self.forward_engine(pkt, (iface,))  # Any interface but the incoming one
+                            if out_iface is not None:
+                                out_iface.packets.put(pkt)  # The packet is sent to the out iface
+                            else:
+                                self.interestDrop.add(pkt)
                     elif self.mode == 1:  # Flood routing
                         if pkt.name in self.PIT.table:
                             if pkt.id not in self.PIT.table[pkt.name].ids:
                                 self.PIT.table[pkt.name].ids.append(pkt.id)
-                            self.PIT.table[pkt.name].incoming[iface] = self.timeout
+                            self.PIT.attach(pkt.name, iface, self.schedule(self.expire_pit, (pkt.name, iface)))
                         elif pkt.name not in self.PIT.table:
-                            self.PIT.table[pkt.name] = PITobject(pkt.name, pkt.id, iface, self.timeout)
+                            self.PIT.add(PITobject(pkt.name, pkt.id, iface,
+                                                   self.schedule(self.expire_pit, (pkt.name, iface))))
                             for out_iface in self.interfaces:
                                 if out_iface is not iface:
-                                    pkt_c = copy.deepcopy(pkt)
+                                    pkt_c = pkt.copy()
                                     out_iface.packets.put(pkt_c)
                         else:
-                            self.interestDrop.append(pkt)
+                            self.interestDrop.add(pkt)
                 elif pkt.mode == 1 and pkt.ant:
                     if pkt.id in self.PAT.table:
                         # Create entry in FIB OR UPDATE IT
                         pheromone = self.pheromone  # TODO Specify pheromone value
                         # The node has already received a Data packet (ant or content) with that name
-                        if pkt.name in self.FIB.table:
-                            self.FIB.table[pkt.name].outgoings[iface] += pheromone
+                        if pkt.name in self.FIB:
+                            self.FIB.deposit(pkt.name, iface, pheromone)
                         # The node never received a Data packet with that name before
                         else:
                             entry = FIBobject(pkt.name, iface, self.interfaces, pheromone)
-                            self.FIB.table[pkt.name] = entry
+                            self.FIB.add(entry)
 
                         # Remove entry in PAT
                         entry2 = self.PAT.table.pop(pkt.id)
@@ -326,234 +416,338 @@ class Node(object):
                         # Create entry in FIB OR UPDATE IT
                         pheromone = self.pheromone
                         # The node has already received a Data packet (ant or content) with that name
-                        if pkt.name in self.FIB.table:
-                            self.FIB.table[pkt.name].outgoings[iface] += pheromone
+                        if pkt.name in self.FIB:
+                            self.FIB.deposit(pkt.name, iface, pheromone)
                         # The node never received a Data packet with that name before
                         else:
                             entry = FIBobject(pkt.name, iface, self.interfaces, pheromone)
-                            self.FIB.table[pkt.name] = entry
+                            self.FIB.add(entry)
 
                     # Cache Data if strategy says so
-                    if pkt.name in self.CS.table:
-                        self.CS.table[pkt.name].lifetime = self.timeout
+                    cached = self.CS.probe(pkt.name)
+                    if cached is not None:
+                        self.CS.refresh(cached, self.timeout)
                     else:
-                        cache = CSobject(pkt.name, pkt.data, self.timeout, pkt.creator)
-                        self.CS.table[pkt.name] = cache
+                        self.CS.put(CSobject(pkt.name, pkt.data, self.timeout, pkt.creator, pkt.size))
 
                     # Remove entry in PIT
                     # Take incoming iface from PIT
                     # Send Data packet back to the incoming interface
                     if pkt.name in self.PIT.table:
-                        pkt.trail.append((self.name, self.env.now))
-                        entry = self.PIT.table.pop(pkt.name)  # Retrieve and remove the Interest entry for pkt.name
-                        self.servedData.append(entry)
+                        pkt.add_hop(self.name, self.env.now)
+                        entry = self.PIT.pop(pkt.name)  # Retrieve and remove the Interest entry for pkt.name
+                        self.servedData.add(entry)
                         for in_iface, y in entry.incoming.items():  # Loops the interfaces assigned to that name
-                            pkt_c = copy.deepcopy(pkt)
+                            pkt_c = pkt.copy()
                             in_iface.packets.put(pkt_c)  # sends the pkt further to that interfaces
                     else:
                         if not pkt.ant:
                             if pkt.name in self.timeouts:
-                                self.timeoutPackets.append(pkt)
+                                self.timeoutPackets.add(pkt)
                             else:
-                                self.wastedPackets.append(pkt)
+                                self.wastedPackets.add(pkt)
                 else:
                     if not pkt.ant:
                         if pkt.mode == 0:
-                            self.interestDrop.append(pkt)
+                            self.interestDrop.add(pkt)
                         else:
                             if pkt.name in self.timeouts:
-                                self.timeoutPackets.append(pkt)
+                                self.timeoutPackets.add(pkt)
                             else:
-                                self.wastedPackets.append(pkt)
+                                self.wastedPackets.add(pkt)
 
     def prepare(self):
         # Prepares the network with area requests so the users will fetch the data much faster
         for area in self.areas:
             if area != self.area:  # Do not send interest for your own area
                 yield self.env.timeout(0.01)  # generate packets at fix speed
+                name = registry.intern(area)
                 for iface in self.interfaces:
-                    pkt = Packet(self.name, self.env.now, 10, area, 50, self.pkt_id, True)
+                    pkt = Packet(self.name, self.env.now, 10, name, 50, self.pkt_id, True)
                     self.pkt_id += 1
                     iface.packets.put(pkt)
 
+    def populate(self, routes, pheromone=None):
+        # Alternative to prepare(), fills the FIB with an entry for each area of @routes (interface name by area), as
+        # if an ant of the area had come back through that interface, with @pheromone on it
+        if pheromone is None:
+            pheromone = self.pheromone
+        faces = {iface.name: iface for iface in self.interfaces}
+        for area, face in routes.items():
+            self.FIB.add(FIBobject(registry.intern(area), faces[face], self.interfaces, pheromone))
+
     def add_interface(self, iface):
         if isinstance(iface, list):
             for each in iface:
                 if each not in self.interfaces:
                     self.interfaces.append(each)
+                    self.FIB.add_interface(each)
                 else:
                     print("Error - Interface already existing " + each.name)
         else:
             if iface not in self.interfaces:
                 self.interfaces.append(iface)
+                self.FIB.add_interface(iface)
             else:
                 print("Error - Interface already existing " + iface.name)
 
+    def reseed(self, streams):
+        # Draws from the Node streams of @streams from now on, for the replications forked from a warmed up network
+        self.streams = streams.component(self.name)
+        self.forwarding = self.streams.forwarding
+        self.dist = functools.partial(self.streams.evaporation.expovariate, 1.0)
+        if self.arena is not None:
+            self.arena.clock.dist = functools.partial(streams.evaporation.expovariate, 1.0)
+        else:
+            self.clock.dist = self.dist
+
     # Returns the list of entries in FIB which match the general name of the content requested
     # If returns empty list, there is no record on that name nor its domains.
     # It checks the different domain levels of the content name, differentiated by '/'
     def domain_matching(self, name):
-        # List of entries in the FIB matching the different domain levels of the content name
-        dest = []
-        for i in range(len(name.split('/'))):
-            gen_name = name.rsplit('/', i)[0]
-            for key in self.FIB.table:
-                if gen_name in key:
-                    dest.append(self.FIB.table[key])
-            if dest:
-                break
-        return dest
+        # The FIB trie finds the deepest domain level with entries below it
+        match = self.FIB.matching(name)
+        if match is None:
+            return []
+        return NameTrie.entries(match)
 
     # Returns a dict with the interfaces of the node and the sum of pheromone for each entry in the FIB partially
     # matching @name.
     def domain_iface(self, name):
-        fib_ob = dict()
-        # Initialize list with node's interfaces
-        for iface in self.interfaces:
-            fib_ob[iface] = 0.0
-        # Update list with pheromone amounts
-        for entry in self.domain_matching(name):
-            for iface, pher in entry.outgoings.items():
-                fib_ob[iface] += pher
-        return fib_ob
-
-    def forward_engine(self, pkt):
+        # The pheromone amounts of the matching entries are already added up in the FIB trie
+        match = self.FIB.matching(name)
+        weights = self.FIB.weights(match) if match is not None else {}
+        return {iface: weights.get(iface, 0.0) for iface in self.interfaces}
+
+    def forward_engine(self, pkt, exclude=()):
         # The heuristic function deciding which outgoing interface is going to be chosen
         # Different function for ants and for content, the power strength the decision when content is routed
-        if self.domain_matching(pkt.name):
+        # The interfaces in @exclude are never chosen, the draw is done over the rest. Returns None if all are excluded
+        if self.FIB.matching(pkt.name) is not None:
             # If there is an exact match of the content name in the FIB
-            if pkt.name in self.FIB.table:
+            if pkt.name in self.FIB:
                 if pkt.ant:
                     pwr = 1.5
                 else:
                     pwr = 2
-                entry = self.FIB.table[pkt.name].outgoings
+                iface = self.FIB.sample(pkt.name, pwr, self.forwarding.uniform, exclude)
             # There is at least one partial match of the content name in the FIB
             else:
-                entry = self.domain_iface(pkt.name)
-                pwr = 1
-            total = 0.0
-            for i in entry.values():
-                total += i ** pwr
-            rand = random.uniform(0.0, total)
-            for iface, pheromone in entry.items():
-                if rand - (pheromone ** pwr) < 0:
-                    return iface
-                else:
-                    rand -= pheromone ** pwr
-        return random.choices(self.interfaces)[0]
+                iface = sample_weights(self.domain_iface(pkt.name), 1, self.forwarding.uniform, exclude)
+            if iface is not None:
+                return iface
+        if not exclude:
+            return self.forwarding.choices(self.interfaces)[0]
+        eligible = [iface for iface in self.interfaces if iface not in exclude]
+        if not eligible:
+            return None
+        return self.forwarding.choice(eligible)
+
+    def wake(self):
+        # Wakes up the evaporate process when an entry is added to the empty PAT or PIT
+        if self.idle is not None and not self.idle.triggered:
+            self.idle.succeed()
+
+    def schedule(self, callback, key):
+        # Returns the evaporation tick where a PAT or PIT entry added now expires, and registers @callback for it
+        tick = self.clock.ticks(self.env.now)
+        self.timers.advance(tick)
+        self.timers.schedule(tick + self.timeout, callback, key)
+        self.wake()
+        return tick + self.timeout
+
+    def expire_pat(self, ant_id, deadline):
+        entry = self.PAT.table.get(ant_id)
+        if entry is not None and entry.lifetime == deadline:
+            self.PAT.table.pop(ant_id)
+
+    def expire_pit(self, key, deadline):
+        name, iface = key
+        entry = self.PIT.table.get(name)
+        if entry is not None and entry.incoming.get(iface) == deadline:
+            self.PIT.detach(name, iface)
+            # print(str(self.env.now) + str(iface.name) + "was deleted from " + str(name) + " from " + str(self.name))
+            if not entry.incoming:
+                self.PIT.pop(name)
+                self.timeouts.add(name)
+                # print(str(self.env.now) + str(name) + "was deleted from " + str(self.name))
 
     def evaporate(self):
+        # The pheromones evaporate lazily in the FIB, on the ticks of self.clock. This process fires the expiry of the
+        # PAT and PIT entries on the same ticks, and sleeps while both tables are empty
         while True:
-            yield self.env.timeout(self.dist())
-            # Evaporate pheromones
-            fibs = []
-            for fib_object in self.FIB.table.values():
-                delete = True
-                for iface, pheromone in fib_object.outgoings.items():
-                    if pheromone > 1 + self.reduce_const:
-                        self.FIB.table[fib_object.name].outgoings[iface] -= self.reduce_const
-                        delete = False
-                if delete:
-                    fibs.append(fib_object.name)
-            for fib_ob in fibs:
-                self.FIB.table.pop(fib_ob)
-            # Reduce or delete PAT-PIT entries
-            ids = []
-            for ant_id, pat_object in self.PAT.table.items():
-                if pat_object.lifetime < 2:
-                    ids.append(ant_id)
-                else:
-                    pat_object.lifetime -= 1
-            for ant_id in ids:
-                self.PAT.table.pop(ant_id)
-            # Emptying PIT
-            llista = []
-            for name, pit_object in self.PIT.table.items():
-                pits = []
-                for iface, time in pit_object.incoming.items():
-                    if time < 2:
-                        pits.append(iface)
-                        # print(str(self.env.now) + str(iface.name) + "was deleted from " + str(name) + " from " + str(self.name))
-                    else:
-                        pit_object.incoming[iface] -= 1
-                for iface in pits:
-                    pit_object.incoming.pop(iface)
-                    if not pit_object.incoming:
-                        llista.append(name)
-            for name in llista:
-                self.timeouts[name] = self.PIT.table[name]
-                self.PIT.table.pop(name)
-                # print(str(self.env.now) + str(name) + "was deleted from " + str(self.name))
+            if not self.PAT.table and not self.PIT.table:
+                self.timers.clear()
+                self.idle = self.env.event()
+                yield self.idle
+                self.idle = None
+            self.clock.ticks(self.env.now)
+            yield self.env.timeout(self.clock.next - self.env.now)
+            self.timers.advance(self.clock.ticks(self.env.now))
 
 
 class NodeMonitor(object):
-    def __init__(self, env, nodes):
+    """ Samples the size of the tables of every Node.
+
+        The Nodes keep the size of their tables in gauges, so a sample costs the same whatever the amount of entries.
+        The samples are saved in NumPy buffers, with a row per sample and a column per Node, that double their
+        length when full.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            environment of the Nodes
+        nodes : dict
+            Nodes to monitor
+        arena : PheromoneArena
+            if given, a copy of the pheromones of the whole network is saved on every sample
+        interval : float
+            time between two samples
+        on_change : bool
+            if True, a sample is only saved when a table has changed since the previous one
+        capacity : int
+            initial amount of samples of the buffers
+    """
+    tables = ('pat', 'pit', 'cs', 'fib')
+
+    def __init__(self, env, nodes, arena=None, interval=0.2, on_change=False, capacity=1024):
         self.env = env
         self.nodes = nodes
-        self.pat = []
-        self.pit = []
-        # self.cs = []
-        # self.fib = dict()
-        # self.store = dict()
-        self.packets = []
-        # for node in self.nodes.values():
-        #     self.store[node.name] = []
-        self.times = []
+        self.names = [node.name for node in nodes.values()]  # Name of the Node of each column
+        self.gauges = [node.metrics.gauge(table) for node in nodes.values() for table in self.tables]
+        self.arena = arena
+        self.pheromones = []
+        self.interval = interval
+        self.on_change = on_change
+        self.count = 0  # Samples saved
+        self.buffer_times = np.zeros(capacity)
+        self.samples = np.zeros((capacity, len(self.names), len(self.tables)), dtype=np.int64)
         self.action = env.process(self.run())
 
     def run(self):
         while True:
-            yield self.env.timeout(0.2)
-            # Save time
-            self.times.append(self.env.now)
-            # fibs = {}
-            pats = {}
-            pits = {}
-            css = {}
-            for node in self.nodes.values():
-                # Save PAT info
-                pats[node.name] = len(node.PAT.table)
-                # Save PIT info
-                tot_pit = 0
-                for entry in node.PIT.table.values():
-                    tot_pit += len(entry.incoming)
-                pits[node.name] = tot_pit
-
-                # if len(node.store.items) > 0:
-                #     self.store[node.name].append((len(node.store.items), self.env.now))
-
-                # Save CS info
-                # css[node.name] = list(node.CS.table.keys())
-                # Save FIB info
-
-                # for iface in node.interfaces:
-                #     dict_cont = {entry.name: pheromone
-                #                  for entry in node.FIB.table.values()
-                #                  for iface2, pheromone in entry.outgoings.items()
-                #                  if iface2 is iface}
-
-                    # for entry in node.FIB.table.values():
-                    #     for iface2, pher in entry.outgoings.items():
-                    #         dict_cont[iface2.name] = pher
-                    #     llista[entry.name] = dict_cont
-
-                    # self.fib[node.name][iface.name].append(dict_cont)
-            self.pat.append(pats)
-            self.pit.append(pits)
-            # self.cs.append(css)
+            yield self.env.timeout(self.interval)
+            self.sample()
+
+    def sample(self):
+        values = np.fromiter((gauge.value for gauge in self.gauges), dtype=np.int64, count=len(self.gauges))
+        values = values.reshape(len(self.names), len(self.tables))
+        if self.on_change and self.count and np.array_equal(values, self.samples[self.count - 1]):
+            return
+        if self.count == len(self.buffer_times):
+            self.buffer_times = np.concatenate((self.buffer_times, np.zeros_like(self.buffer_times)))
+            self.samples = np.concatenate((self.samples, np.zeros_like(self.samples)))
+        # Save time
+        self.buffer_times[self.count] = self.env.now
+        self.samples[self.count] = values
+        self.count += 1
+        if self.arena is not None:
+            self.pheromones.append(self.arena.snapshot())
+
+    @property
+    def times(self):
+        return self.buffer_times[:self.count]
+
+    def series(self, table):
+        # Returns the (samples x Nodes) array of the sizes of @table
+        return self.samples[:self.count, :, self.tables.index(table)]
+
+    @property
+    def pat(self):
+        # Entries in the PAT of each Node
+        return self.series('pat')
+
+    @property
+    def pit(self):
+        # Incoming interfaces in the PIT of each Node
+        return self.series('pit')
+
+    @property
+    def cs(self):
+        return self.series('cs')
+
+    @property
+    def fib(self):
+        return self.series('fib')
+
+
+class Quiescence(object):
+    """ Ends a run once nothing left in the network can change what the Consumers receive.
+
+        The network is quiescent when no Consumer has a request process running and there is no packet other than
+        ants queued or being transmitted anywhere. The requests not satisfied by then can not be anymore, they are
+        counted as expired. Only the ants, the evaporation and the monitors would keep running.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            environment of the simulation, run with env.run(until=quiescence.stop)
+        consumers : iterable
+            Consumers whose requests are waited for
+        components : iterable
+            Nodes, Producers and the rest of components whose queues and interfaces are checked
+        until : float
+            time the run ends at if the network is never quiescent
+        interval : float
+            time between two checks
+    """
+    def __init__(self, env, consumers, components, until, interval=1.0):
+        self.env = env
+        self.consumers = list(consumers)
+        self.stores = [component.store for component in self.consumers + list(components)]
+        self.interfaces = [iface for component in components for iface in Quiescence._interfaces(component)]
+        self.interfaces += [consumer.interface for consumer in self.consumers if consumer.interface is not None]
+        self.until = until
+        self.interval = interval
+        self.quiescent = False  # Whether the run ended before @until
+        self.time = None  # Time the run ended at
+        self.expired = 0  # Names requested and never received
+        self.stop = env.event()
+        self.action = env.process(self.run())
+
+    @staticmethod
+    def _interfaces(component):
+        if hasattr(component, 'interfaces'):
+            return component.interfaces
+        return [component.interface] if getattr(component, 'interface', None) is not None else []
+
+    def run(self):
+        while self.env.now + self.interval < self.until:
+            yield self.env.timeout(self.interval)
+            if self.check():
+                self.quiescent = True
+                break
+        else:
+            yield self.env.timeout(self.until - self.env.now)
+        self.time = self.env.now
+        self.expired = sum(len(consumer.outstanding()) for consumer in self.consumers)
+        self.stop.succeed(self.time)
+
+    def check(self):
+        # Returns True if the network is quiescent
+        if any(consumer.active for consumer in self.consumers):
+            return False
+        for iface in self.interfaces:
+            if iface.sending is not None and not iface.sending.ant:
+                return False
+            if any(not pkt.ant for pkt in iface.packets.items):
+                return False
+        # The stores keep PriorityItem(packet, [interface, packet])
+        return not any(not item[0].ant for store in self.stores for item in store.items)
 
 
 class Interface(object):
     def __init__(self, env, name, store, iface=None, rate=100000000.0):
-        self.antWaste = []
-        self.contentWaste = []
+        self.metrics = Metrics()  # Counters of the packets whose lifetime ended in the interface
+        self.antWaste = self.metrics.counter('ant_waste')
+        self.contentWaste = self.metrics.counter('content_waste')
         self.env = env
         self.name = name
         self.out_iface = iface
         self.store = store  # Gonna point to the Node, consumer or producer with iface store
         self.rate = rate
         self.packets = simpy.PriorityStore(env)
+        self.sending = None  # Packet being transmitted
         self.action = env.process(self.send())
 
     def add_interface(self, iface):
@@ -567,38 +761,642 @@ class Interface(object):
             pkt = yield self.packets.get()
             if pkt.lifetime > 1:
                 time = (pkt.size * 8.0) / self.rate
+                self.sending = pkt
                 yield self.env.timeout(time)  # Packet transmission time
+                self.sending = None
                 pkt.lifetime -= 1
                 self.out_iface.put(pkt)
             else:
                 if pkt.ant is not None:
-                    self.antWaste.append(pkt)
+                    self.antWaste.add(pkt)
                 else:
-                    self.contentWaste.append(pkt)
+                    self.contentWaste.add(pkt)
 
     def __repr__(self):
         return "Interface: {}".\
             format(self.name)
 
 
+class Evaporation(object):
+    """ Evaporation ticks of a Node.
+
+        The ticks are separated by random times drawn from @dist, as the old evaporate() process did, but they are
+        only drawn when somebody needs to know how many ticks have happened.
+    """
+    def __init__(self, dist):
+        self.dist = dist
+        self.count = 0  # Ticks happened so far
+        self.next = None  # Time of the next tick
+
+    def ticks(self, now):
+        # Returns the amount of ticks happened until @now
+        if self.next is None:
+            self.next = self.dist()
+        while self.next <= now:
+            self.count += 1
+            self.next += self.dist()
+        return self.count
+
+
 class FIB(object):
-    def __init__(self):
+    """ FIB with lazily evaporating pheromones.
+
+        On every evaporation tick each pheromone above 1 + reduce_const loses reduce_const, and an entry whose
+        pheromones are all below it is deleted. Instead of updating every entry on every tick, each entry keeps the
+        tick its pheromones were last updated at, and they are brought up to date when the entry is read. The ticks
+        where a pheromone stops evaporating, or an entry has to be deleted, are kept in a heap.
+    """
+    def __init__(self, env, clock, reduce_const):
+        self.env = env
+        self.clock = clock
+        self.reduce_const = reduce_const
+        self.tick = 0  # Last evaporation tick applied
         self.table = dict()  # list of FIB objects
+        self.trie = NameTrie(registry=registry)  # Same entries by name component, with the pheromone of each subtree
+        self.expiry = []  # Heap of (tick, serial, name, iface), iface None means the entry is deleted
+        self.serial = 0
+
+    def __contains__(self, name):
+        self.expire()
+        return name in self.table
+
+    def __len__(self):
+        # Entries not deleted yet, the ones whose evaporation has ended are only deleted when the FIB is read
+        return len(self.table)
+
+    def _push(self, tick, name, iface):
+        self.serial += 1
+        heapq.heappush(self.expiry, (tick, self.serial, name, iface))
+
+    def _evaporates(self, entry, iface, tick):
+        # Schedules the tick where the pheromone of @iface stops evaporating, returns False if it already did
+        pheromone = entry.outgoings[iface]
+        if pheromone > 1 + self.reduce_const:
+            entry.floors[iface] = tick + math.ceil((pheromone - 1 - self.reduce_const) / self.reduce_const - 1e-9)
+            self._push(entry.floors[iface], entry.name, iface)
+            return True
+        entry.floors.pop(iface, None)
+        return False
+
+    def _schedule(self, entry):
+        # The entry is deleted on the tick after its last pheromone stops evaporating
+        entry.expires = max(entry.floors.values(), default=entry.ticks) + 1
+        self._push(entry.expires, entry.name, None)
+
+    def _refresh(self, entry, tick):
+        # Brings the pheromones of @entry to the evaporation tick @tick
+        if tick != entry.ticks:
+            for iface, floor in entry.floors.items():
+                entry.outgoings[iface] -= self.reduce_const * (min(tick, floor) - entry.ticks)
+                self._resample(entry, iface)
+            entry.ticks = tick
+
+    @staticmethod
+    def _resample(entry, iface):
+        # Updates the weight of @iface in the samplers of @entry
+        for pwr, sampler in entry.samplers.items():
+            sampler.update(iface, entry.outgoings[iface] ** pwr)
+
+    def expire(self):
+        # Applies the evaporation ticks happened until now and returns the current tick
+        tick = self.clock.ticks(self.env.now)
+        while self.expiry and self.expiry[0][0] <= tick:
+            at, serial, name, iface = heapq.heappop(self.expiry)
+            entry = self.table.get(name)
+            if entry is None:
+                continue
+            if iface is None:
+                if entry.expires == at:
+                    self.pop(name)
+            elif entry.floors.get(iface) == at:
+                # The pheromone stops evaporating, its weight in the trie does not depend on the tick anymore
+                self._refresh(entry, at)
+                del entry.floors[iface]
+                self.trie.add(name, iface, -self.reduce_const * at)
+                self.trie.add_rate(name, iface, -1)
+        self.tick = tick
+        return tick
+
+    def add(self, entry):
+        tick = self.expire()
+        entry.ticks = tick
+        self.table[entry.name] = entry
+        # An evaporating pheromone p is added to the trie as p + reduce_const * tick with rate 1
+        weights = dict()
+        rates = dict()
+        for iface, pheromone in entry.outgoings.items():
+            if self._evaporates(entry, iface, tick):
+                weights[iface] = pheromone + self.reduce_const * tick
+                rates[iface] = 1
+            else:
+                weights[iface] = pheromone
+        self.trie.insert(entry.name, entry, weights, rates)
+        self._schedule(entry)
+
+    def deposit(self, name, iface, pheromone):
+        # Adds @pheromone to @iface in the entry @name
+        tick = self.expire()
+        entry = self.table[name]
+        self._refresh(entry, tick)
+        before = iface in entry.floors
+        entry.outgoings[iface] += pheromone
+        self._resample(entry, iface)
+        after = self._evaporates(entry, iface, tick)
+        self.trie.add(name, iface, pheromone + self.reduce_const * tick * (after - before))
+        if after != before:
+            self.trie.add_rate(name, iface, after - before)
+        self._schedule(entry)
+
+    def add_interface(self, iface):
+        # Gives @iface, added to the Node after some entries were created, the basic pheromone in all of them
+        tick = self.expire()
+        for entry in self.table.values():
+            if iface not in entry.outgoings:
+                self._refresh(entry, tick)
+                entry.outgoings[iface] = 1
+                entry.samplers.clear()
+                self.trie.add(entry.name, iface, 1)
+
+    def pop(self, name):
+        entry = self.table.pop(name)
+        weights = {iface: pheromone + self.reduce_const * entry.ticks if iface in entry.floors else pheromone
+                   for iface, pheromone in entry.outgoings.items()}
+        self.trie.remove(name, weights, {iface: 1 for iface in entry.floors})
+        return entry
+
+    def outgoings(self, name):
+        # Returns the pheromone per interface of the entry @name, up to date
+        tick = self.expire()
+        entry = self.table[name]
+        self._refresh(entry, tick)
+        return entry.outgoings
+
+    def sample(self, name, pwr, uniform, exclude=()):
+        # Returns an interface of the entry @name drawn with probability proportional to its pheromone ** @pwr,
+        # leaving out the interfaces in @exclude. None if all of them are excluded or have no weight
+        tick = self.expire()
+        entry = self.table[name]
+        self._refresh(entry, tick)
+        sampler = entry.samplers.get(pwr)
+        if sampler is None:
+            # Built the first time the entry is sampled with @pwr, then kept up to date with the pheromones
+            sampler = WeightedSampler(entry.outgoings, [pheromone ** pwr for pheromone in entry.outgoings.values()])
+            entry.samplers[pwr] = sampler
+        return sampler.sample(uniform, exclude)
+
+    def matching(self, name):
+        # Returns the trie node of the first domain level of @name with entries, None if there is none
+        self.expire()
+        return self.trie.longest_match(name)
+
+    def weights(self, node):
+        # Returns the pheromone per interface of all the entries below the trie @node, up to date
+        shift = self.reduce_const * self.tick
+        return {iface: weight - shift * node.rates.get(iface, 0) for iface, weight in node.weights.items()}
+
+
+class MatrixFIB(object):
+    """ FIB keeping the pheromones of all its entries in a single (names x interfaces) array.
+
+        Same interface and evaporation as FIB. The evaporation ticks happened since the last access are applied to
+        the whole array at once: a pheromone p stops evaporating after ceil((p - 1 - reduce_const) / reduce_const)
+        ticks, and a row is deleted once all its pheromones have. Rows of deleted entries are reused.
+
+        Parameters
+        ----------
+        interfaces : list
+            interfaces of the Node, a column is added for the interfaces appended to it later
+    """
+    def __init__(self, env, clock, reduce_const, interfaces, capacity=16):
+        self.env = env
+        self.clock = clock
+        self.reduce_const = reduce_const
+        self.interfaces = interfaces
+        self.tick = 0  # Last evaporation tick applied
+        self.values = np.zeros((capacity, max(len(interfaces), 1)))  # Pheromone of each name (row) and iface (column)
+        self.rows = dict()  # Row of each name
+        self.names = [None] * capacity  # Name of each row, None if the row is free
+        self.columns = dict()  # Column of each interface
+        self.faces = []  # Interface of each column
+        self.free = []  # Rows of deleted entries
+        self.size = 0  # Rows used so far, the rows after it have never been used
+        self.trie = NameTrie(registry=registry)  # Names by component, the entries are the names themselves
+
+    def __contains__(self, name):
+        self.expire()
+        return name in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _columns(self):
+        # Adds a column for each interface of the Node without one, the existing rows get 0 for it
+        for iface in self.interfaces[len(self.faces):]:
+            self.columns[iface] = len(self.faces)
+            self.faces.append(iface)
+        if len(self.faces) > self.values.shape[1]:
+            values = np.zeros((self.values.shape[0], len(self.faces)))
+            values[:, :self.values.shape[1]] = self.values
+            self.values = values
+
+    def _row(self, name):
+        # Returns a free row for @name, growing the array if all of them are used
+        if self.free:
+            row = self.free.pop()
+        else:
+            if self.size == self.values.shape[0]:
+                self.values = np.concatenate((self.values, np.zeros_like(self.values)))
+                self.names.extend([None] * self.size)
+            self.size += 1
+            row = self.size - 1
+        self.names[row] = name
+        return row
+
+    def _release(self, row):
+        self.names[row] = None
+        self.free.append(row)
+
+    def expire(self):
+        # Applies the evaporation ticks happened until now and returns the current tick
+        tick = self.clock.ticks(self.env.now)
+        elapsed = tick - self.tick
+        if elapsed and self.rows:
+            values = self.values[:self.size]
+            # Ticks each pheromone still evaporates, 0 for the ones at their minimum and for the free rows
+            steps = np.maximum(np.ceil((values - 1 - self.reduce_const) / self.reduce_const - 1e-9), 0)
+            values -= self.reduce_const * np.minimum(steps, elapsed)
+            for row in np.flatnonzero(steps.max(axis=1) < elapsed).tolist():
+                if self.names[row] is not None:
+                    self.pop(self.names[row])
+        self.tick = tick
+        return tick
+
+    def add(self, entry):
+        # Stores the pheromones of the FIBobject @entry, the object itself is not kept
+        self.expire()
+        self._columns()
+        row = self._row(entry.name)
+        values = self.values
+        values[row] = 0.0
+        for iface, pheromone in entry.outgoings.items():
+            values[row, self.columns[iface]] = pheromone
+        self.rows[entry.name] = row
+        self.trie.insert(entry.name, entry.name, {})
+
+    def deposit(self, name, iface, pheromone):
+        # Adds @pheromone to @iface in the entry @name
+        self.expire()
+        self.values[self.rows[name], self.columns[iface]] += pheromone
+
+    def add_interface(self, iface):
+        # Gives @iface, added to the Node after some entries were created, the basic pheromone in all of them
+        self.expire()
+        self._columns()
+        column = self.columns[iface]
+        values = self.values
+        for row in self.rows.values():
+            values[row, column] = 1.0
+
+    def pop(self, name):
+        row = self.rows.pop(name)
+        self.trie.remove(name, {})
+        outgoings = dict(zip(self.faces, self.values[row].tolist()))
+        self._release(row)
+        return outgoings
+
+    def outgoings(self, name):
+        # Returns the pheromone per interface of the entry @name, up to date
+        self.expire()
+        return dict(zip(self.faces, self.values[self.rows[name]].tolist()))
+
+    def sample(self, name, pwr, uniform, exclude=()):
+        # Same draw as FIB.sample, over the running sum of the row
+        self.expire()
+        weights = self.values[self.rows[name], :len(self.faces)] ** pwr
+        for iface in exclude:
+            if iface in self.columns:
+                weights[self.columns[iface]] = 0.0
+        cumulative = np.cumsum(weights)
+        if not len(cumulative) or cumulative[-1] <= 0.0:
+            return None
+        column = int(np.searchsorted(cumulative, uniform(0.0, cumulative[-1]), side='right'))
+        if column >= len(self.faces):
+            return None
+        return self.faces[column]
+
+    def matching(self, name):
+        # Returns the trie node of the first domain level of @name with entries, None if there is none
+        self.expire()
+        return self.trie.longest_match(name)
+
+    def weights(self, node):
+        # Returns the pheromone per interface of all the entries below the trie @node, up to date
+        rows = [self.rows[name] for name in NameTrie.entries(node)]
+        return dict(zip(self.faces, self.values[rows, :len(self.faces)].sum(axis=0).tolist()))
+
+    def snapshot(self):
+        # Returns the names, the interfaces and a copy of their pheromones
+        self.expire()
+        names = list(self.rows)
+        return names, list(self.faces), self.values[[self.rows[name] for name in names], :len(self.faces)]
+
+
+class ArenaFIB(MatrixFIB):
+    """ MatrixFIB of a Node whose pheromones are kept in a PheromoneArena.
+
+        The rows are the rows of the names in the arena, shared by all the Nodes, and the array is the slice of the
+        Node in the arena. The evaporation is applied by the arena to all the Nodes at once.
+    """
+    def __init__(self, arena, index, interfaces):
+        self.arena = arena
+        self.index = index  # Position of the Node in the arena
+        self.env = arena.env
+        self.clock = arena.clock
+        self.reduce_const = arena.reduce_const
+        self.interfaces = interfaces
+        self.rows = dict()
+        self.columns = dict()
+        self.faces = []
+        self.trie = NameTrie(registry=registry)
+
+    @property
+    def values(self):
+        # View of the pheromones of the Node, the arena array is replaced when it grows
+        return self.arena.values[self.index]
+
+    @property
+    def tick(self):
+        return self.arena.tick
+
+    def _columns(self):
+        for iface in self.interfaces[len(self.faces):]:
+            self.columns[iface] = len(self.faces)
+            self.faces.append(iface)
+        self.arena.widen(len(self.faces))
+
+    def _row(self, name):
+        row = self.arena.row(name)
+        self.arena.live[self.index, row] = True
+        return row
+
+    def _release(self, row):
+        self.arena.live[self.index, row] = False
+        self.arena.values[self.index, row] = 0.0
+
+    def expire(self):
+        return self.arena.expire()
+
+
+class PheromoneArena(object):
+    """ Pheromones of the FIBs of all the Nodes of a network in a single (nodes x names x interfaces) array.
+
+        It is owned by the scenario and given to the Nodes when they are created. All the Nodes share its evaporation
+        ticks, and the ticks happened since the last access are applied to the whole network at once, with the same
+        rule as MatrixFIB.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            environment of the Nodes
+        reduce_const : float
+            pheromone lost on every evaporation tick
+        dist : function
+            returns the time between two evaporation ticks
+        capacity : int
+            initial amount of names
+    """
+    def __init__(self, env, reduce_const=0.05, dist=None, capacity=16):
+        self.env = env
+        self.reduce_const = reduce_const
+        if dist is None:
+            dist = functools.partial(shared.evaporation.expovariate, 1.0)
+        self.clock = Evaporation(dist)  # Evaporation ticks of the whole network
+        self.tick = 0  # Last evaporation tick applied
+        self.values = np.zeros((0, capacity, 1))  # Pheromone of each Node, name and interface
+        self.live = np.zeros((0, capacity), dtype=bool)  # Whether each Node has an entry for each name
+        self.rows = dict()  # Row of each name, shared by all the Nodes
+        self.names = []  # Name of each row
+        self.fibs = []  # FIB of each Node
+
+    def __len__(self):
+        return len(self.fibs)
+
+    def register(self, interfaces):
+        # Adds a Node with the list of @interfaces and returns its FIB
+        fib = ArenaFIB(self, len(self.fibs), interfaces)
+        self.fibs.append(fib)
+        if len(self.fibs) > self.values.shape[0]:
+            grow = max(self.values.shape[0], 1)
+            self.values = np.concatenate((self.values, np.zeros((grow,) + self.values.shape[1:])))
+            self.live = np.concatenate((self.live, np.zeros((grow,) + self.live.shape[1:], dtype=bool)))
+        return fib
+
+    def row(self, name):
+        # Returns the row of @name, adding one if it is new
+        row = self.rows.get(name)
+        if row is None:
+            row = len(self.names)
+            if row == self.values.shape[1]:
+                self.values = np.concatenate((self.values, np.zeros_like(self.values)), axis=1)
+                self.live = np.concatenate((self.live, np.zeros_like(self.live)), axis=1)
+            self.rows[name] = row
+            self.names.append(name)
+        return row
+
+    def widen(self, faces):
+        # Makes room for @faces interfaces per Node
+        if faces > self.values.shape[2]:
+            values = np.zeros(self.values.shape[:2] + (faces,))
+            values[:, :, :self.values.shape[2]] = self.values
+            self.values = values
+
+    def expire(self):
+        # Applies the evaporation ticks happened until now to all the Nodes and returns the current tick
+        tick = self.clock.ticks(self.env.now)
+        elapsed = tick - self.tick
+        if elapsed:
+            self.tick = tick
+            values = self.values[:len(self.fibs), :len(self.names)]
+            steps = np.maximum(np.ceil((values - 1 - self.reduce_const) / self.reduce_const - 1e-9), 0)
+            values -= self.reduce_const * np.minimum(steps, elapsed)
+            dead = self.live[:len(self.fibs), :len(self.names)] & (steps.max(axis=2) < elapsed)
+            for index, row in zip(*np.nonzero(dead)):
+                self.fibs[index].pop(self.names[row])
+        return tick
+
+    def snapshot(self):
+        # Returns a copy of the pheromones of all the Nodes, the rows are in the order of self.names
+        self.expire()
+        return self.values[:len(self.fibs), :len(self.names)].copy()
 
 
 class PIT(object):
     def __init__(self):
         self.table = dict()  # Dict with name as a key, values incoming interface
+        self.faces = 0  # Incoming interfaces of all the entries, kept up to date when they are added or removed
+
+    def __len__(self):
+        return self.faces
+
+    def add(self, entry):
+        self.table[entry.name] = entry
+        self.faces += len(entry.incoming)
+
+    def attach(self, name, iface, lifetime):
+        # Adds @iface to the entry @name, or refreshes its lifetime
+        entry = self.table[name]
+        if iface not in entry.incoming:
+            self.faces += 1
+        entry.incoming[iface] = lifetime
+
+    def detach(self, name, iface):
+        self.table[name].incoming.pop(iface)
+        self.faces -= 1
+
+    def pop(self, name):
+        entry = self.table.pop(name)
+        self.faces -= len(entry.incoming)
+        return entry
 
 
 class PAT(object):
     def __init__(self, ):
         self.table = dict()  # Dict with id as a key, values incoming interface and content name
 
+    def __len__(self):
+        return len(self.table)
+
 
 class CS(object):
-    def __init__(self, ):
+    """ Content Store, bounded if given a capacity.
+
+        The entries pinned (the area entry of the Node) are not counted in the capacity and never evicted, the rest
+        are evicted by the policy when a new one does not fit.
+        An entry expires @lifetime after it was stored or last refreshed. The expiry times are kept in a heap, with
+        the old times of the refreshed entries left in it and skipped when they come out, and the entries expired
+        are removed when the store is accessed, so nothing is done while the Node is idle.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            environment of the Node, its time is the one the entries expire with
+        capacity : int
+            maximum entries, or bytes, of the evictable entries, None for an unbounded store
+        policy : string
+            eviction policy, 'lru', 'lfu' or 'arc' (see caching.POLICIES)
+        unit : string
+            'entries' or 'bytes', the size of an entry in bytes is the size of the Data packet it came in
+        metrics : Metrics
+            registry the hits, misses and evictions are counted in
+    """
+    def __init__(self, env, capacity=None, policy='lru', unit='entries', metrics=None):
+        self.env = env
         self.table = dict()  # list of CS objects
+        self.expiry = []  # Heap of (time, serial, name), the entry is only removed if it still expires at that time
+        self.serial = 0
+        self.pinned = set()  # Names of the entries never evicted
+        self.capacity = capacity
+        self.unit = unit
+        self.used = 0  # Entries or bytes of the evictable entries
+        self.policy = None  # Not needed when the store is unbounded
+        if capacity is not None:
+            self.policy = POLICIES[policy](capacity) if policy == 'arc' and unit == 'entries' else POLICIES[policy]()
+        if metrics is None:
+            metrics = Metrics()
+        self.hits = metrics.counter('cs_hits')
+        self.misses = metrics.counter('cs_misses')
+        self.evictions = metrics.counter('cs_evictions')
+        self.expirations = metrics.counter('cs_expirations')
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, name):
+        return name in self.table
+
+    def _size(self, entry):
+        return entry.size if self.unit == 'bytes' else 1
+
+    def pin(self, entry):
+        self.table[entry.name] = entry
+        self.pinned.add(entry.name)
+
+    def _schedule(self, entry):
+        entry.expires = self.env.now + entry.lifetime
+        self.serial += 1
+        heapq.heappush(self.expiry, (entry.expires, self.serial, entry.name))
+        if len(self.expiry) > 2 * len(self.table) + 64:
+            # Too many old times of refreshed entries, the heap is built again with the current ones
+            self.expiry = [(each.expires, serial, each.name) for serial, each in enumerate(self.table.values())
+                           if each.name not in self.pinned]
+            heapq.heapify(self.expiry)
+
+    def expire(self):
+        # Removes the entries whose lifetime has ended
+        now = self.env.now
+        while self.expiry and self.expiry[0][0] <= now:
+            at, serial, name = heapq.heappop(self.expiry)
+            entry = self.table.get(name)
+            if entry is not None and entry.expires == at and name not in self.pinned:
+                self.pop(name)
+                self.expirations.add(entry)
+
+    def refresh(self, entry, lifetime):
+        # The stored @entry expires @lifetime from now
+        entry.lifetime = lifetime
+        if entry.name not in self.pinned:
+            self._schedule(entry)
+
+    def get(self, name):
+        # Returns the entry @name for an Interest, counted as a hit or a miss, None if it is not stored
+        self.expire()
+        entry = self.table.get(name)
+        if entry is None:
+            self.misses.add()
+            return None
+        self.hits.add()
+        if self.policy is not None and name not in self.pinned:
+            self.policy.hit(name)
+        return entry
+
+    def probe(self, name):
+        # Same as get() without counting it, for the ants and the Data packets going through
+        self.expire()
+        entry = self.table.get(name)
+        if entry is not None and self.policy is not None and name not in self.pinned:
+            self.policy.hit(name)
+        return entry
+
+    def put(self, entry):
+        # Stores @entry, evicting others if it does not fit. Returns False if it is larger than the whole store
+        self.expire()
+        if self.policy is not None:
+            size = self._size(entry)
+            if size > self.capacity:
+                return False
+            self.policy.admit(entry.name)
+            while self.used + size > self.capacity:
+                self.evict(entry.name)
+            self.policy.insert(entry.name)
+            self.used += size
+        self.table[entry.name] = entry
+        self._schedule(entry)
+        return True
+
+    def evict(self, incoming=None):
+        # Removes the entry chosen by the policy to make room for @incoming
+        entry = self.table.pop(self.policy.evict(incoming))
+        self.used -= self._size(entry)
+        self.evictions.add(entry)
+
+    def pop(self, name):
+        entry = self.table.pop(name)
+        if name in self.pinned:
+            self.pinned.discard(name)
+        elif self.policy is not None:
+            self.policy.remove(name)
+            self.used -= self._size(entry)
+        return entry
 
 
 class FIBobject(object):
@@ -608,17 +1406,21 @@ class FIBobject(object):
         for iface in interfaces:  # Creates a pair for each interface in the node with the basic amount of pheromones
             self.outgoings[iface] = 1
         self.outgoings[in_iface] += pheromone  # Increases the pheromones level for the desired iface
+        self.ticks = 0  # Evaporation tick the pheromones are up to date with
+        self.floors = dict()  # Tick where each evaporating pheromone reaches its minimum
+        self.expires = 0  # Tick where the entry is deleted
+        self.samplers = dict()  # Weighted sampler of the interfaces for each power of the pheromones
 
     def __repr__(self):
         return "\nName: {}, Pheromones: {}".\
-            format(self.name, self.outgoings)
+            format(registry.name(self.name), self.outgoings)
 
 
 class PITobject(object):
     def __init__(self, name, p_id, interface, lifetime):
         self.name = name
         self.ids = [p_id]
-        self.incoming = {interface: lifetime}  # dictionary with (interface,lifetime)
+        self.incoming = {interface: lifetime}  # dictionary with (interface, evaporation tick it expires at)
 
 
 class PATobject(object):
@@ -626,12 +1428,14 @@ class PATobject(object):
         self.serial = serial  # Serial number of the ant
         self.name = name
         self.interface = interface
-        self.lifetime = lifetime
+        self.lifetime = lifetime  # Evaporation tick it expires at
 
 
 class CSobject(object):
-    def __init__(self, name, data, lifetime, producer):
+    def __init__(self, name, data, lifetime, producer, size=0):
         self.name = name
         self.data = data
         self.lifetime = lifetime
         self.producer = producer
+        self.size = size  # Size of the Data packet, in bytes
+        self.expires = None  # Time it expires at, set by the CS
@@ -5,6 +5,10 @@ import random
 import string
 import functools
 
+from metrics import Metrics
+from names import NameTrie
+from sampling import sample_weights
+
 """
     In this library the data is transmitted. That means using Content Store to use in-network storage.
     Now the ants need to check whether the data is in the CS, and if so, they need to create a Data packet as a response.
@@ -205,6 +209,8 @@ class Node(object):
         self.action = env.process(self.run())  # starts the run() method as a SimPy process
         self.action2 = env.process(self.evaporate())  # starts the run() method as a SimPy process
         self.dist = functools.partial(random.expovariate, 1.0)
+        self.metrics = Metrics()  # Counters of the packets dropped, read by the scenarios
+        self.interestDrop = self.metrics.counter('interest_drop')  # Interests with no interface to go out
 
     def run(self):
         self.env.process(self.prepare())
@@ -248,31 +254,34 @@ class Node(object):
                                 out_iface = list(self.PIT.table[pkt.name].incoming.keys())
                                 if iface not in out_iface:
                                     out_iface.append(iface)
-                                if len(out_iface) < len(self.interfaces):
-                                    while iface in out_iface:
-                                        iface = self.forward_engine(pkt)  # The ForwardEngine decides outgoing interface
+                                # The ForwardEngine decides among the interfaces the packet has not come from
+                                iface = self.forward_engine(pkt, out_iface)
+                                if iface is not None:
                                     iface.packets.put(pkt)  # The packet is sent to the out iface
+                                else:
+                                    self.interestDrop.add(pkt)
                             else:
                                 self.PIT.table[pkt.name].incoming[iface] = self.timeout
                                 self.PIT.table[pkt.name].ids.append(pkt.id)
                         else:
                             # Create entry in the PIT table for the Interest packet
                             self.PIT.table[pkt.name] = PITobject(pkt.name, pkt.id, iface, self.timeout)
-                            out_iface = iface
-                            while out_iface is iface:
-                                out_iface = self.forward_engine(pkt)  # The ForwardEngine decides outgoing interface
-                            out_iface.packets.put(pkt)  # The packet is sent to the out iface
+                            out_iface = self.forward_engine(pkt, (iface,))  # Any interface but the incoming one
+                            if out_iface is not None:
+                                out_iface.packets.put(pkt)  # The packet is sent to the out iface
+                            else:
+                                self.interestDrop.add(pkt)
                 elif pkt.mode == 1 and pkt.ant:
                     if pkt.id in self.PAT.table:
                         # Create entry in FIB OR UPDATE IT
                         pheromone = self.pheromone  # TODO Specify pheromone value
                         # The node has already received a Data packet (ant or content) with that name
                         if pkt.name in self.FIB.table:
-                            self.FIB.table[pkt.name].outgoings[iface] += pheromone
+                            self.FIB.deposit(pkt.name, iface, pheromone)
                         # The node never received a Data packet with that name before
                         else:
                             entry = FIBobject(pkt.name, iface, self.interfaces, pheromone)
-                            self.FIB.table[pkt.name] = entry
+                            self.FIB.add(entry)
 
                         # Remove entry in PAT
                         entry2 = self.PAT.table.pop(pkt.id)
@@ -286,11 +295,11 @@ class Node(object):
                     pheromone = self.pheromone  # TODO Specify pheromone value
                     # The node has already received a Data packet (ant or content) with that name
                     if pkt.name in self.FIB.table:
-                        self.FIB.table[pkt.name].outgoings[iface] += pheromone
+                        self.FIB.deposit(pkt.name, iface, pheromone)
                     # The node never received a Data packet with that name before
                     else:
                         entry = FIBobject(pkt.name, iface, self.interfaces, pheromone)
-                        self.FIB.table[pkt.name] = entry
+                        self.FIB.add(entry)
 
                     # Cache Data if strategy says so
                     if pkt.name in self.CS.table:
@@ -337,35 +346,26 @@ class Node(object):
     # If returns empty list, there is no record on that name nor its domains.
     # It checks the different domain levels of the content name, differentiated by '/'
     def domain_matching(self, name):
-        # List of entries in the FIB matching the different domain levels of the content name
-        dest = []
-        for i in range(len(name.split('/'))):
-            gen_name = name.rsplit('/', i)[0]
-            for key in self.FIB.table:
-                if gen_name in key:
-                    dest.append(self.FIB.table[key])
-            if dest:
-                break
-        return dest
+        # The FIB trie finds the deepest domain level with entries below it
+        match = self.FIB.matching(name)
+        if match is None:
+            return []
+        return NameTrie.entries(match)
 
     # Returns a dict with the interfaces of the node and the sum of pheromone for each entry in the FIB partially
     # matching @name.
     def domain_iface(self, name):
-        fib_ob = dict()
-        # Initialize list with node's interfaces
-        for iface in self.interfaces:
-            fib_ob[iface] = 0.0
-        # Update list with pheromone amounts
-        for entry in self.domain_matching(name):
-            for iface, pher in entry.outgoings.items():
-                fib_ob[iface] += pher
-        return fib_ob
-
-    def forward_engine(self, pkt):
+        # The pheromone amounts of the matching entries are already added up in the FIB trie
+        match = self.FIB.matching(name)
+        weights = match.weights if match is not None else {}
+        return {iface: weights.get(iface, 0.0) for iface in self.interfaces}
+
+    def forward_engine(self, pkt, exclude=()):
         # The heuristic function deciding which outgoing interface is going to be chosen
         # Different function for ants and for content, the power strength the decision when content is routed
+        # The interfaces in @exclude are never chosen, the draw is done over the rest. Returns None if all are excluded
 
-        if self.domain_matching(pkt.name):
+        if self.FIB.matching(pkt.name) is not None:
             # If there is an exact match of the content name in the FIB
             if pkt.name in self.FIB.table:
                 if pkt.ant:
@@ -377,16 +377,15 @@ class Node(object):
             else:
                 entry = self.domain_iface(pkt.name)
                 pwr = 1
-            total = 0.0
-            for i in entry.values():
-                total += i ** pwr
-            rand = random.uniform(0.0, total)
-            for iface, pheromone in entry.items():
-                if rand - (pheromone ** pwr) < 0:
-                    return iface
-                else:
-                    rand -= pheromone ** pwr
-        return random.choices(self.interfaces)[0]
+            iface = sample_weights(entry, pwr, random.uniform, exclude)
+            if iface is not None:
+                return iface
+        if not exclude:
+            return random.choices(self.interfaces)[0]
+        eligible = [iface for iface in self.interfaces if iface not in exclude]
+        if not eligible:
+            return None
+        return random.choice(eligible)
 
     def evaporate(self):
         while True:
@@ -397,12 +396,12 @@ class Node(object):
                 delete = True
                 for iface, pheromone in fib_object.outgoings.items():
                     if pheromone > 1 + self.reduce_const:
-                        self.FIB.table[fib_object.name].outgoings[iface] -= self.reduce_const
+                        self.FIB.deposit(fib_object.name, iface, -self.reduce_const)
                         delete = False
                 if delete:
                     fibs.append(fib_object.name)
             for fib_ob in fibs:
-                self.FIB.table.pop(fib_ob)
+                self.FIB.pop(fib_ob)
             # Reduce or delete PAT-PIT entries
             ids = []
             for ant_id, pat_object in self.PAT.table.items():
@@ -516,6 +515,25 @@ class Interface(object):
 class FIB(object):
     def __init__(self):
         self.table = dict()  # list of FIB objects
+        self.trie = NameTrie()  # Same entries by name component, with the pheromone of each subtree
+
+    def add(self, entry):
+        self.table[entry.name] = entry
+        self.trie.insert(entry.name, entry, entry.outgoings)
+
+    def deposit(self, name, iface, pheromone):
+        # Changes the pheromone of @iface in the entry @name, negative amounts evaporate it
+        self.table[name].outgoings[iface] += pheromone
+        self.trie.add(name, iface, pheromone)
+
+    def pop(self, name):
+        entry = self.table.pop(name)
+        self.trie.remove(name, entry.outgoings)
+        return entry
+
+    def matching(self, name):
+        # Returns the trie node of the first domain level of @name with entries, None if there is none
+        return self.trie.longest_match(name)
 
 
 class PIT(object):
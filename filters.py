@@ -0,0 +1,127 @@
+import hashlib
+import math
+from collections import deque
+
+import numpy as np
+
+"""
+    Names seen recently, to tell whether a Data packet arriving without a PIT entry comes after the entry timed out.
+    Only the names seen in the last @window of simulated time are remembered, so the memory used does not grow with
+    the length of the run. RecentSet remembers them exactly, RecentBloom in a fixed amount of memory, with a few
+    false positives.
+"""
+
+
+class RecentSet(object):
+    """ Names added in the last @window of time, exactly.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            environment whose time is used
+        window : float
+            time a name is remembered after it was added
+    """
+    def __init__(self, env, window=100.0):
+        self.env = env
+        self.window = window
+        self.added = dict()  # Last time each name was added
+        self.order = deque()  # (time, name) in the order they were added
+
+    def _forget(self):
+        oldest = self.env.now - self.window
+        while self.order and self.order[0][0] <= oldest:
+            time, name = self.order.popleft()
+            if self.added.get(name) == time:
+                del self.added[name]
+
+    def add(self, name):
+        self._forget()
+        self.added[name] = self.env.now
+        self.order.append((self.env.now, name))
+
+    def __contains__(self, name):
+        self._forget()
+        return name in self.added
+
+    def __len__(self):
+        return len(self.added)
+
+    @property
+    def nbytes(self):
+        # Approximate memory used, 3 references per name in the deque and the dict
+        return 8 * 3 * len(self.order) + 8 * 3 * len(self.added)
+
+
+class RecentBloom(object):
+    """ Names added in the last @window of time, in two Bloom filters used in turns.
+
+        Names are added to the current filter, and every @window the previous one is cleared and becomes the current
+        one, so a name is remembered for between @window and 2 * @window. A name never added is reported as seen with
+        probability @error while there are at most @capacity names per window. The filters are plain bit arrays, not
+        counting Bloom filters: a name is never removed from a filter, the whole filter is cleared when it is reused.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            environment whose time is used
+        window : float
+            minimum time a name is remembered after it was added
+        capacity : int
+            names added per window the filters are sized for
+        error : float
+            false positive rate with @capacity names
+    """
+    def __init__(self, env, window=100.0, capacity=10000, error=0.01):
+        self.env = env
+        self.window = window
+        self.bits = max(int(math.ceil(-capacity * math.log(error) / math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.bits / capacity * math.log(2))), 1)
+        self.filters = [np.zeros(self.bits, dtype=bool), np.zeros(self.bits, dtype=bool)]
+        self.current = 0  # Filter names are added to
+        self.started = 0.0  # Time the current filter started at
+        self.counts = [0, 0]  # Names added to each filter
+
+    def _rotate(self):
+        elapsed = self.env.now - self.started
+        if elapsed >= self.window:
+            if elapsed >= 2 * self.window:  # The current filter is older than a window too
+                self.filters[self.current][:] = False
+                self.counts[self.current] = 0
+            self.current = 1 - self.current
+            self.filters[self.current][:] = False
+            self.counts[self.current] = 0
+            self.started = self.env.now
+
+    def _positions(self, name):
+        # Double hashing of the name, an interned integer or a string. hash() of strings changes from one Python
+        # run to another, the key is taken from the bytes of the name so the false positives are the same in every run
+        key = int.from_bytes(hashlib.blake2b(str(name).encode(), digest_size=8).digest(), 'little')
+        first = (key * 0xFF51AFD7ED558CCD) & 0xFFFFFFFFFFFFFFFF
+        second = ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 1 | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, name):
+        self._rotate()
+        self.filters[self.current][self._positions(name)] = True
+        self.counts[self.current] += 1
+
+    def __contains__(self, name):
+        self._rotate()
+        positions = self._positions(name)
+        return bool(self.filters[0][positions].all() or self.filters[1][positions].all())
+
+    def __len__(self):
+        # Names added to the filters in use, counted again if added twice
+        return self.counts[0] + self.counts[1]
+
+    @property
+    def nbytes(self):
+        return self.filters[0].nbytes + self.filters[1].nbytes
+
+
+def recent_filter(env, window=100.0, error=None, capacity=10000):
+    # Returns a RecentSet, or a RecentBloom with false positive rate @error if given
+    if error is None:
+        return RecentSet(env, window)
+    return RecentBloom(env, window, capacity, error)
@@ -0,0 +1,135 @@
+"""
+    Metrics of the simulation components.
+    Every component keeps a Metrics registry with the counters of the events the scenarios analyse (packets lost,
+    dropped, served...) and the gauges of its current state (size of the tables...). Only the amounts are kept,
+    along with a few sampled packets as exemplars if asked, so the memory used does not grow with the traffic.
+"""
+
+EXEMPLARS = 0  # Exemplars kept by each counter, 0 keeps none
+SAMPLE_EVERY = 100  # One exemplar is kept every SAMPLE_EVERY events
+
+
+class Counter(object):
+    """ Amount of events of a kind.
+
+        Parameters
+        ----------
+        name : string
+            kind of event counted
+        exemplars : int
+            maximum amount of exemplars kept
+        every : int
+            an exemplar is kept every @every events, starting with the first one
+    """
+    __slots__ = ('name', 'count', 'exemplars', 'capacity', 'every')
+
+    def __init__(self, name, exemplars=0, every=1):
+        self.name = name
+        self.count = 0
+        self.exemplars = []
+        self.capacity = exemplars
+        self.every = max(every, 1)
+
+    def add(self, item=None, amount=1):
+        # Counts @amount events, @item is the object related to them
+        if self.capacity and len(self.exemplars) < self.capacity and self.count % self.every == 0:
+            self.exemplars.append(item)
+        self.count += amount
+
+    @property
+    def value(self):
+        return self.count
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return "{}: {}".format(self.name, self.count)
+
+
+class Gauge(object):
+    """ Current level of something that goes up and down.
+
+        Parameters
+        ----------
+        name : string
+            what is measured
+        read : function
+            if given, returns the level, for sizes the component already keeps up to date
+    """
+    __slots__ = ('name', 'level', 'read')
+
+    def __init__(self, name, read=None):
+        self.name = name
+        self.level = 0
+        self.read = read
+
+    def add(self, amount=1):
+        self.level += amount
+
+    def set(self, level):
+        self.level = level
+
+    @property
+    def value(self):
+        if self.read is not None:
+            return self.read()
+        return self.level
+
+    def __repr__(self):
+        return "{}: {}".format(self.name, self.value)
+
+
+class Metrics(object):
+    """ Registry of the metrics of a component, by name.
+
+        Parameters
+        ----------
+        exemplars : int
+            maximum amount of exemplars kept by each counter, EXEMPLARS by default
+        every : int
+            an exemplar is kept every @every events, SAMPLE_EVERY by default
+    """
+    def __init__(self, exemplars=None, every=None):
+        self.exemplars = EXEMPLARS if exemplars is None else exemplars
+        self.every = SAMPLE_EVERY if every is None else every
+        self.metrics = dict()
+
+    def counter(self, name):
+        # Returns the counter @name, creating it the first time
+        counter = self.metrics.get(name)
+        if counter is None:
+            counter = Counter(name, self.exemplars, self.every)
+            self.metrics[name] = counter
+        return counter
+
+    def gauge(self, name, read=None):
+        # Returns the gauge @name, creating it the first time
+        gauge = self.metrics.get(name)
+        if gauge is None:
+            gauge = Gauge(name, read)
+            self.metrics[name] = gauge
+        return gauge
+
+    def __getitem__(self, name):
+        # Returns the value of the metric @name, 0 if nothing has been counted
+        metric = self.metrics.get(name)
+        return metric.value if metric is not None else 0
+
+    def __contains__(self, name):
+        return name in self.metrics
+
+    def __iter__(self):
+        return iter(self.metrics.values())
+
+    def values(self):
+        # Returns a dict with the value of every metric
+        return {name: metric.value for name, metric in self.metrics.items()}
+
+    def __repr__(self):
+        return "Metrics: {}".format(self.values())
+
+
+def total(components, name):
+    # Returns the sum of the metric @name over the @components with a metrics registry
+    return sum(component.metrics[name] for component in components)
@@ -0,0 +1,163 @@
+"""
+    Helpers for hierarchical content names, like "Trondheim/video/01".
+    NameRegistry interns every name into an integer id, along with the ids of its prefixes, so the tables and packets
+    carry ints and the strings are only needed to export the results.
+    NameTrie indexes the entries of a table by the components of their names, so the entries sharing a prefix are
+    found walking the name once instead of comparing it with every key of the table.
+"""
+
+
+class NameRegistry(object):
+    """ Interned names.
+
+        Parameters
+        ----------
+        separator : string
+            separator of the name components
+    """
+    def __init__(self, separator='/'):
+        self.separator = separator
+        self.ids = dict()  # Id of each name
+        self.names = []  # Name of each id
+        self.parents = []  # Id of the name without its last component, -1 for names of a single component
+        self.paths = []  # Ids of the prefixes of the name, from its first component to the name itself
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        # Returns the id of @name, registering it and its prefixes the first time
+        nid = self.ids.get(name)
+        if nid is None:
+            head, separator, _ = name.rpartition(self.separator)
+            parent = self.intern(head) if separator else -1
+            nid = len(self.names)
+            self.ids[name] = nid
+            self.names.append(name)
+            self.parents.append(parent)
+            self.paths.append((self.paths[parent] if parent >= 0 else ()) + (nid,))
+        return nid
+
+    def name(self, nid):
+        return self.names[nid]
+
+    def depth(self, nid):
+        # Amount of components of the name
+        return len(self.paths[nid])
+
+
+class TrieNode(object):
+    __slots__ = ('children', 'entry', 'count', 'weights', 'rates')
+
+    def __init__(self):
+        self.children = dict()  # Next name component -> TrieNode
+        self.entry = None  # Entry whose name ends in this node
+        self.count = 0  # Amount of entries in this subtree
+        self.weights = dict()  # Sum of the weights of all the entries in this subtree, by key
+        self.rates = dict()  # Sum of the rates the weights of this subtree change with, by key
+
+
+class NameTrie(object):
+    """ Component-wise trie of names.
+
+        Every node keeps the amount of entries below it and the sum of their weights (the pheromone per interface
+        in the FIB), so both the matching entries and their aggregate are found in O(name depth).
+        Weights changing linearly with time, like evaporating pheromone, are kept as a weight at time 0 plus a rate.
+
+        Parameters
+        ----------
+        separator : string
+            separator of the name components
+        registry : NameRegistry
+            if given, the names are ids of this registry and the trie is walked by the ids of their prefixes
+    """
+    def __init__(self, separator='/', registry=None):
+        self.separator = separator
+        self.registry = registry
+        self.root = TrieNode()
+
+    def _components(self, name):
+        if self.registry is not None:
+            return self.registry.paths[name]
+        return name.split(self.separator)
+
+    def _path(self, name):
+        # Returns the list of nodes from the first component of @name to its last one, creating them if needed
+        node = self.root
+        path = []
+        for component in self._components(name):
+            child = node.children.get(component)
+            if child is None:
+                child = TrieNode()
+                node.children[component] = child
+            path.append(child)
+            node = child
+        return path
+
+    def insert(self, name, entry, weights, rates=None):
+        path = self._path(name)
+        path[-1].entry = entry
+        for node in path:
+            node.count += 1
+            for key, weight in weights.items():
+                node.weights[key] = node.weights.get(key, 0.0) + weight
+            if rates:
+                for key, rate in rates.items():
+                    node.rates[key] = node.rates.get(key, 0) + rate
+
+    def add(self, name, key, amount):
+        # Adds @amount to the weight @key of the entry @name
+        for node in self._path(name):
+            node.weights[key] = node.weights.get(key, 0.0) + amount
+
+    def add_rate(self, name, key, amount):
+        # Adds @amount to the rate of the weight @key of the entry @name
+        for node in self._path(name):
+            node.rates[key] = node.rates.get(key, 0) + amount
+
+    def remove(self, name, weights, rates=None):
+        parent = self.root
+        for component in self._components(name):
+            node = parent.children[component]
+            node.count -= 1
+            if node.count == 0:
+                # Nothing left below, the whole subtree is dropped
+                del parent.children[component]
+                return
+            for key, weight in weights.items():
+                node.weights[key] -= weight
+            if rates:
+                for key, rate in rates.items():
+                    node.rates[key] -= rate
+            parent = node
+        parent.entry = None
+
+    def longest_match(self, name):
+        # Returns the deepest node along @name having entries below it, None if there is none
+        # That is the first domain level of the name, from the full name up to its first component, matching entries
+        node = self.root
+        path = []
+        for component in self._components(name):
+            node = node.children.get(component)
+            if node is None:
+                break
+            path.append(node)
+        for node in reversed(path):
+            if node.count:
+                return node
+        return None
+
+    @staticmethod
+    def entries(node):
+        # Returns the list of entries in the subtree of @node
+        entries = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.entry is not None:
+                entries.append(node.entry)
+            stack.extend(node.children.values())
+        return entries
+
+
+registry = NameRegistry()  # Names of the simulation, shared by all its components
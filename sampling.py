@@ -0,0 +1,113 @@
+"""
+    Weighted random choice of the outgoing interface.
+    The forward engine picks an interface with probability proportional to its pheromone ** pwr: a uniform number in
+    [0, total) is drawn and the interface where the running sum of the weights passes it is chosen. The same draw is
+    kept here, with the running sums in a Fenwick tree so they do not have to be added up for every packet.
+"""
+
+
+class WeightedSampler(object):
+    """ Fenwick tree over the weights of a list of keys.
+
+        Parameters
+        ----------
+        keys : list
+            keys to choose from, the order is kept when walking the running sum
+        weights : list
+            initial weight of each key
+    """
+    def __init__(self, keys, weights):
+        self.keys = list(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.weights = [float(weight) for weight in weights]
+        self.size = len(self.keys)
+        self.tree = [0.0] * (self.size + 1)
+        for i, weight in enumerate(self.weights):
+            j = i + 1
+            self.tree[j] += weight
+            parent = j + (j & -j)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[j]
+        self.step = 1  # Highest power of 2 not above the size, for the search
+        while self.step * 2 <= self.size:
+            self.step *= 2
+
+    def __len__(self):
+        return self.size
+
+    def update(self, key, weight):
+        # Sets the weight of @key
+        i = self.index[key]
+        delta = weight - self.weights[i]
+        self.weights[i] = weight
+        j = i + 1
+        while j <= self.size:
+            self.tree[j] += delta
+            j += j & -j
+
+    def prefix(self, i):
+        # Returns the sum of the weights of the first @i keys
+        total = 0.0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return self.prefix(self.size)
+
+    def find(self, value):
+        # Returns the position of the first key whose running sum is above @value, self.size if there is none
+        pos = 0
+        step = self.step
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= value:
+                pos = nxt
+                value -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+    def sample(self, uniform, exclude=()):
+        """ Returns a key drawn with probability proportional to its weight, None if nothing could be drawn.
+
+            Parameters
+            ----------
+            uniform : function
+                uniform(a, b) returns a random number between a and b, like random.uniform
+            exclude : iterable
+                keys that can not be chosen, the draw is done over the weights of the rest
+        """
+        total = self.total()
+        excluded = sorted(self.index[key] for key in exclude if key in self.index)
+        for pos in excluded:
+            total -= self.weights[pos]
+        if total <= 0.0:
+            return None
+        value = uniform(0.0, total)
+        # Skip over the excluded keys, shifting the value past their weight
+        for pos in excluded:
+            if value >= self.prefix(pos):
+                value += self.weights[pos]
+            else:
+                break
+        pos = self.find(value)
+        if pos >= self.size or self.keys[pos] in exclude:
+            return None
+        return self.keys[pos]
+
+
+def sample_weights(weights, pwr, uniform, exclude=()):
+    # Same draw as WeightedSampler.sample over a dict of (key, weight), for weights used only once
+    items = [(key, weight ** pwr) for key, weight in weights.items() if key not in exclude]
+    total = 0.0
+    for key, weight in items:
+        total += weight
+    if total <= 0.0:
+        return None
+    value = uniform(0.0, total)
+    for key, weight in items:
+        if value - weight < 0:
+            return key
+        value -= weight
+    return None
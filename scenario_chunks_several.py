@@ -1,15 +1,15 @@
-import functools
 import random
 import sys
 import time
 
 import simpy
-from numpy import std
 
+from aggregation import Aggregator, TargetPrecision
+from campaign import run_sequential
 from components_chunks import Consumer, Producer, Node, Interface, NodeMonitor
+from tracing import EventTrace
 import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.stats import sem, t
 
 """
     This scenario is a developed version of scenario 1 where the topology is 
@@ -24,34 +24,6 @@ from scipy.stats import sem, t
 """
 
 
-def trace(env, callback):
-    """Replace the ``step()`` method of *env* with a tracing function
-    that calls *callbacks* with an events time, priority, ID and its
-    instance just before it is processed.
-    """
-
-    def get_wrapper(env_step, callback):
-        """Generate the wrapper for env.step()."""
-
-        @functools.wraps(env_step)
-        def tracing_step():
-            """Call *callback* for the next event if one exist before
-            calling ``env.step()``."""
-            if len(env._queue):
-                t, prio, eid, event = env._queue[0]
-                callback(t, prio, eid, event)
-            return env_step()
-
-        return tracing_step
-
-    env.step = get_wrapper(env.step, callback)
-
-
-def monitor_f(data, t, prio, eid, event):
-    if not issubclass(type(event), simpy.events.Timeout):
-        data.append((t, eid, type(event), event.value))
-
-
 def simulate(llavor):
     random.seed(llavor)
     env = simpy.Environment()  # Create the SimPy environment
@@ -110,9 +82,11 @@ def simulate(llavor):
     env.process(consumer1.request("video"))
     env.process(consumer1.request("audio"))
 
-    data = []
-    monitor_d = functools.partial(monitor_f, data)
-    trace(env, monitor_d)
+    # Trace the events to a binary file as they happen
+    events = EventTrace('data/scenario5_10data_' + str(time.time())[0:8] + '.trace')
+    for component in (node1, node2, node3, node4, node5, consumer1, consumer2, producer):
+        events.watch(component)
+    events.attach(env)
 
     # Run it
     env.run(300)
@@ -133,9 +107,8 @@ def simulate(llavor):
     # for pkt in consumer2.receivedPackets:
     #     print(pkt)
 
-    # Save events information to a file
-    data_f = pd.DataFrame(data)
-    data_f.to_csv('data/scenario5_10data_' + str(time.time())[0:8] + '.csv')
+    # Save events information to a file, tracing.trace_frame() reads it back
+    events.close()
 
     # # Save CS information to a file
     # cs_f = pd.DataFrame(monitor_n.cs, index=monitor_n.times)
@@ -153,8 +126,8 @@ def visualize(pit, pat, pkt, pkt_err, times):
     #     con1[pkt1.name] = pkt1.time
     # for pkt2 in pkt_a[1]:
     #     con2[pkt2.name] = pkt2.time
-    out_consumer = pd.DataFrame({'C01': pkt[0], 'C02': pkt[1]})
-    err_consumer = pd.DataFrame({'C01': pkt_err[0], 'C02': pkt_err[1]})
+    out_consumer = pd.DataFrame({'C{:02d}'.format(k + 1): received for k, received in enumerate(pkt)})
+    err_consumer = pd.DataFrame({'C{:02d}'.format(k + 1): errors for k, errors in enumerate(pkt_err)})
     # means = out_consumer.mean()
     # errors = out_consumer.std()
     out_pat = pd.DataFrame(pat, index=times)
@@ -218,99 +191,51 @@ def visualize(pit, pat, pkt, pkt_err, times):
 
 
 if __name__ == '__main__':
-    simulacions = 1000
-    monitor = []
-    for j in range(simulacions):
-        monitor.append(simulate(j))
-    # for k in range(len(monitor[0].pat)):
-    #     for l in range(len(monitor)):
-    #         mean_dict = {}
-    #         for key in monitor[0].pat[0].keys():
-    #             # {key: sum(val) / len(monitor[k].pat[0] for a, val in monitor[l].pat[k]}
-    #             n = 0
-    #             t_pat = monitor[k].pat
-    #             for a, b in t_pat[0].items():
-    #                 print(a + b)
-
-    # / len(monitor[0].pat[0])
-    nodes = list(monitor[0].pat[0].keys())
-
-    # pat = {}
-    # for node in nodes:
-    #     pat[node] = sum(monitor[l].pat[58][node] for l in range(simulacions)) / len(nodes)
-
-    # pat = []
-    # for k in range(len(monitor[0].pat)):
-    #     pat.append({node: sum(monitor[l].pat[k][node]
-    #                           for l in range(simulacions)) / len(nodes)
-    #                 for node in nodes})
-
-    pat = [{node: max(monitor[l].pat[k][node]
-                      for l in range(simulacions))
-            for node in nodes}
-           for k in range(len(monitor[0].pat))]
-
-    pit = [{node: max(monitor[l].pit[k][node]
-                      for l in range(simulacions))
-            for node in nodes}
-           for k in range(len(monitor[0].pit))]
-
-    pkt = [{name: [monitor[i].packets[j][name]
-                   for i in range(simulacions)
-                   if name in monitor[i].packets[j]]
-            for name in monitor[0].packets[0].keys()}
-           for j in range(len(monitor[0].packets))]
-
-    pkt_a = [{name: sum(monitor[i].packets[j][name]
-                        for i in range(simulacions)
-                        if name in monitor[i].packets[j]) / simulacions
-              for name in monitor[0].packets[0].keys()}
-             for j in range(len(monitor[0].packets))]
-
-    pkt_std = [{name: std([monitor[i].packets[j][name]
-                          for i in range(simulacions)
-                          if name in monitor[i].packets[j]])
-                for name in monitor[0].packets[0].keys()}
-               for j in range(len(monitor[0].packets))]
-
+    simulacions = 1000  # Maximum amount of replications
     confidence = 0.95
-    n = len(monitor[0].packets[0].keys())
-    pkt_cnf = [{name: sem([monitor[i].packets[j][name]
-                          for i in range(simulacions)
-                          if name in monitor[i].packets[j]]) * t.ppf((1 + confidence) / 2, n - 1)
-                for name in monitor[0].packets[0].keys()}
-               for j in range(len(monitor[0].packets))]
-
-    # pkt_max = [{name: max(monitor[i].packets[j][name]
-    #                       for i in range(simulacions)
-    #                       if name in monitor[i].packets[j]) / simulacions
-    #             for name in monitor[0].packets[0].keys()}
-    #            for j in range(len(monitor[0].packets))]
-    #
-    # pkt_min = [{name: min(monitor[i].packets[j][name]
-    #                       for i in range(simulacions)
-    #                       if name in monitor[i].packets[j]) / simulacions
-    #             for name in monitor[0].packets[0].keys()}
-    #            for j in range(len(monitor[0].packets))]
-
-    # fib = dict()
-    # for node in monitor[0].nodes:
-    #     fib[node.name] = {interface.name: [] for interface in node.interfaces}
-
-    # for node in fib.keys():
-    #     for iface in fib[node].keys():
-    #         cont = []
-    #         for l in range(len(monitor[0].times)):
-    #             dicc = {}
-    #             for k in range(simulacions):
-    #                 for name, pheromone in monitor[k].fib[node][iface][l].items():
-    #                     if name in dicc:
-    #                         dicc[name] += pheromone
-    #                     else:
-    #                         dicc[name] = pheromone
-    #             for name, pher in dicc.items():
-    #                 dicc[name] = pher / simulacions
-    #             cont.append(dicc)
-    #         fib[node][iface] = cont
-
-    visualize(pit, pat, pkt_a, pkt_cnf, monitor[0].times)
+    # Replications are run until the 95 confidence interval of every content time is narrower than this fraction of
+    # its mean, first argument
+    precision = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    # The monitor of each simulation is added to the statistics as soon as it finishes and then discarded
+    # PAT and PIT are keyed by (sample, node) and the content times by (consumer, name)
+    stats = Aggregator()
+    times = []
+    consumers = []  # Index of each consumer, in the order of monitor.packets
+
+    def fold(monitor):
+        if not times:
+            times.extend(monitor.times)
+        if not consumers:
+            consumers.extend(range(len(monitor.packets)))
+        for k in range(len(monitor.pat)):
+            for node, entries in monitor.pat[k].items():
+                stats.add('pat', entries, (k, node))
+            for node, entries in monitor.pit[k].items():
+                stats.add('pit', entries, (k, node))
+        for consumer, received in enumerate(monitor.packets):
+            for name, rtt in received.items():
+                stats.add('rtt', rtt, (consumer, name))
+
+    stop = TargetPrecision({'rtt': (stats, 'rtt')}, precision, confidence)
+    simulacions = run_sequential(simulate, lambda j: [(j,)], fold, stop, simulacions, processes=1)
+    print(stop.report())
+
+    # Maximum entries of each node at each sample time
+    pat = [dict() for _ in range(len(times))]
+    for (k, node), entries in stats.maxima('pat').items():
+        pat[k][node] = entries
+
+    pit = [dict() for _ in range(len(times))]
+    for (k, node), entries in stats.maxima('pit').items():
+        pit[k][node] = entries
+
+    # Average time of each content name, and its 95 confidence interval, for each consumer
+    pkt_a = [dict() for _ in consumers]
+    for (consumer, name), total in stats.totals('rtt').items():
+        pkt_a[consumer][name] = total / simulacions
+
+    pkt_cnf = [dict() for _ in consumers]
+    for (consumer, name), half_width in stats.half_widths('rtt', confidence).items():
+        pkt_cnf[consumer][name] = half_width
+
+    visualize(pit, pat, pkt_a, pkt_cnf, times)
@@ -1,16 +1,19 @@
 import functools
-import os
-import random
 import sys
 import time
 
+import numpy as np
 import simpy
-from scipy.stats import sem, t
 
-from components_flood import Consumer, Producer, Node, Interface, NodeMonitor
+from aggregation import Aggregator, OnlineStats, TargetPrecision
+from campaign import run_sequential
+from components_flood import Consumer, Producer, Node, Interface, NodeMonitor, PheromoneArena, Quiescence
+from metrics import total
+from names import registry
+from streams import Streams
+from topology import load_topology, build_network, shortest_routes, DistanceOracle
 import pandas as pd
 import matplotlib.pyplot as plt
-import networkx as nx
 
 """
     This scenario uses Uninetts topology
@@ -18,95 +21,275 @@ import networkx as nx
 """
 
 
-def trace(env, callback):
-    """Replace the ``step()`` method of *env* with a tracing function
-    that calls *callbacks* with an events time, priority, ID and its
-    instance just before it is processed.
-    """
-
-    def get_wrapper(env_step, callback):
-        """Generate the wrapper for env.step()."""
-
-        @functools.wraps(env_step)
-        def tracing_step():
-            """Call *callback* for the next event if one exist before
-            calling ``env.step()``."""
-            if len(env._queue):
-                t, prio, eid, event = env._queue[0]
-                callback(t, prio, eid, event)
-            return env_step()
-
-        return tracing_step
-
-    env.step = get_wrapper(env.step, callback)
-
-
-def monitor(data, t, prio, eid, event):
-    if not issubclass(type(event), simpy.events.Timeout):
-        data.append((t, eid, type(event), event.value))
-
-
-def importTopology(env, name, mode):
-    nodes = {}
-    interfaces = {}
-    file = open(name, 'r')
-    line = file.readline()
-    while '*Vertices' not in line:
-        line = file.readline()
-    line = file.readline()
-    while '*Arcs' not in line:
-        words = line.split()
-        # Read nodes
-        nodes[words[0]] = Node(env, words[0], words[1][1:-1], words[5][1:-1], mode)
-        line = file.readline()
-    line = file.readline()
-    while line is not '':
-        words = line.split()
-        # Read links
-        tupl = (words[1], words[0])
-        if tupl in interfaces:
-            iface = Interface(env, words[4], nodes[words[0]].store, interfaces[tupl], float(words[6]))
-            interfaces[tupl].add_interface(iface)
-        else:
-            iface = Interface(env, words[4], nodes[words[0]].store, rate=float(words[6]))
-
-        nodes[words[0]].add_interface(iface)
-        interfaces[(words[0], words[1])] = iface
-
-        line = file.readline()
+def importTopology(env, name, mode, fib='dict', streams=None, bootstrap='ants', pheromone=None, cs=None,
+                   recent=None):
+    # Returns the Nodes of the topology, built from the compiled topology
+    # @fib selects the storage of the FIB of the Nodes, 'dict', 'matrix' or 'arena' (a single array for all of them)
+    # @streams are the random streams of the replication, the global random module by default
+    # @bootstrap 'ants' floods area ants from every Node when ant routing, 'shortest' fills the FIBs instead with
+    # the first hop of the shortest path to each area, with @pheromone on it (the one an ant leaves by default)
+    # @cs are the keyword arguments of the Content Store of every Node, i.e. {'capacity': 20, 'policy': 'arc'}
+    # @recent the ones of the filter of the names timed out in the PIT, i.e. {'window': 100, 'error': 0.01}
+    topology = load_topology(name)
+    arena = None
+    if fib == 'arena':
+        arena = PheromoneArena(env, dist=functools.partial(streams.evaporation.expovariate, 1.0) if streams else None)
+    nodes = build_network(env, topology,
+                          lambda nid, node, area: Node(env, nid, node, area, mode, fib, arena, streams, bootstrap,
+                                                       cs, recent), Interface)
+    if mode == 0 and bootstrap == 'shortest':
+        for nid, routes in shortest_routes(topology).items():
+            nodes[nid].populate(routes, pheromone)
     return nodes
 
 
-def printTopology(name, nodes):
-    file = open(name, 'r')
-    line = file.readline()
-    while '*Arcs' not in line:
-        #Skip nodes
-        line = file.readline()
-    line = file.readline()
-    dicc = {}
-    dicc['value'] = []
-    dicc['source'] = []
-    dicc['target'] = []
-    while line is not '':
-        words = line.split()
-        # Read links
-        dicc['source'].append(nodes[words[0]].name)
-        dicc['target'].append(nodes[words[1]].name)
-        dicc['value'].append(words[6])
-
-        line = file.readline()
-
-    plt.figure(figsize=(20, 15))
-    df = pd.DataFrame(dicc)
-    return nx.from_pandas_edgelist(df, 'source', 'target', create_using=nx.DiGraph())
-    # nx.draw(g, with_labels=True, node_color='skyblue', node_size=35, edge_color="blue", width=2.0,
-    #         edge_cmap=plt.get_cmap("winter"))
+class SimulationResult(object):
+    """ Compact outcome of one replication, the only thing sent back from the worker processes.
+
+        Parameters
+        ----------
+        mode : int
+            0 means Ant routing, 1 means flood routing
+        simulation : int
+            index of the replication, the seed of its random streams is 2200 + simulation
+    """
+    def __init__(self, mode, simulation):
+        self.mode = mode
+        self.simulation = simulation
+        self.consumers = 0  # Amount of consumers
+        self.producers = 0  # Amount of producers
+        self.hits = 0  # Content retrieved by all the consumers
+        self.consumer_hits = []  # Content retrieved by each consumer
+        self.waste = 0
+        self.ant_iface = 0
+        self.cnt_iface = 0
+        self.timeouts = 0
+        self.interests = 0
+        self.prod_rec = 0
+        self.con_send = 0
+        self.stretch = {}  # Average stretch per name
+        self.times = {}  # Average time per hop per name
+        self.content_times = {}  # Average time per name
+        self.end = 0  # Time the simulation ended at
+        self.expired = 0  # Names requested and not received
+        self.cs_hits = 0  # Interests answered from the Content Stores
+        self.cs_misses = 0
+        self.cs_evictions = 0
+
+    def __repr__(self):
+        return "mode: {}, simulation: {}, consumers: {}, hits: {}, waste: {}, timeouts: {}".\
+            format(self.mode, self.simulation, self.consumers, self.hits, self.waste, self.timeouts)
+
+
+class WarmNetwork(object):
+    """ Network run without Consumers nor Producers up to the end of the bootstrap of the Nodes (the area ants).
+
+        The replications are forked from it (see campaign.imap_forked), they start with its FIB pheromones, Content
+        Stores, pending events and packets in flight, and only the Consumers, Producers and what happens after the
+        warm up depend on their seed.
+
+        Parameters
+        ----------
+        mode : int
+            0 means Ant routing, 1 means flood routing
+        until : float
+            time the network is run up to, the first Consumer starts requesting at 10
+        fib : string
+            storage of the FIB of the Nodes
+        seed : int
+            seed of the random streams of the warm up
+    """
+    def __init__(self, mode, until, fib='dict', seed=2199):
+        self.mode = mode
+        self.fib = fib
+        self.env = simpy.Environment()
+        self.nodes = importTopology(self.env, 'isis-uninett.net', mode, fib, Streams(seed, block=1024))
+        self.env.run(until)
+
+
+def simulate_warm(networks, mode, simulation, quiescence=False):
+    # Runs the replication @simulation of @mode from the WarmNetwork of the mode in @networks, changing it
+    return simulate(mode, simulation, networks[mode].fib, quiescence, networks[mode])
+
+
+def simulate(mode, simulation, fib='dict', quiescence=False, warm=None, bootstrap='ants', pheromone=None, cs=None,
+             recent=None):
+    # With @quiescence the run ends as soon as the Consumers can not receive anything else, instead of at 2000
+    # @bootstrap and @pheromone select how the FIBs are filled before the Consumers start, @cs bounds the Content
+    # Stores and @recent sets the filter of the names timed out, see importTopology()
+    # With a WarmNetwork @warm, the replication goes on from it instead of building the network, @warm is changed
+    # Each concern of each component draws from its own stream, both modes get the same Consumers, Producers and
+    # requests. The streams are NumPy Generators drawing blocks of numbers
+    streams = Streams(2200+simulation, block=1024)
+    placement = streams.placement
+    if warm is None:
+        env = simpy.Environment()  # Create the SimPy environment
+        nodes = importTopology(env, 'isis-uninett.net', mode, fib, streams, bootstrap, pheromone, cs, recent)
+    else:
+        env, nodes = warm.env, warm.nodes
+        for node in nodes.values():
+            node.reseed(streams)
+    # The Consumers start at the same time with and without warm up
+    start = env.now
+    # Hop distances used to compute the stretch, Consumers and Producers are attached as leaves
+    oracle = DistanceOracle(load_topology('isis-uninett.net'))
+    # Create Consumers
+    consumers = {}
+    for i in range(placement.randint(20, 50)):
+        name = 'C'+str(i)
+        consumers[name] = Consumer(env, name, max(i*3+10 - start, 0), mode, streams)
+        rand = placement.choice(list(nodes.keys()))
+        iface_c = Interface(env, name + "-" + nodes[rand].name, consumers[name].store)
+        iface_n = Interface(env, nodes[rand].name + "-" + name, nodes[rand].store, iface_c)
+        iface_c.add_interface(iface_n)
+        nodes[rand].add_interface(iface_n)
+        consumers[name].add_interface(iface_c)
+        oracle.attach(name, nodes[rand].name)
+    # Create Producer
+    names = ["video", "audio"]
+    # Generate a random number of producers (1-5) in a random location
+    producers = {}
+    for i in range(placement.randint(2, 5)):
+        name = 'P'+str(i)
+        rand = placement.choice(list(nodes.keys()))
+        while nodes[rand].area != 'Trondheim':
+            rand = placement.choice(list(nodes.keys()))
+        producers[name] = Producer(env, names, name, nodes[rand].area, streams)
+        iface_p = Interface(env, name + "-" + nodes[rand].name, producers[name].store)
+        iface_n = Interface(env, nodes[rand].name + "-" + name, nodes[rand].store, iface_p)
+        iface_p.add_interface(iface_n)
+        nodes[rand].add_interface(iface_n)
+        producers[name].add_interface(iface_p)
+        oracle.attach(name, nodes[rand].name)
+
+    # Create static Producer
+    # producer = Producer(env, names, "P01", "Trondheim")
+    # # 5 - hovedbygget
+    # node = nodes['5']
+    # iface_p = Interface(env, "P01" + "-" + node.name, producer.store)
+    # iface_n = Interface(env, node.name + "-" + "P01", node.store, iface_p)
+    # iface_p.add_interface(iface_n)
+    # producer.add_interface(iface_p)
+    # node.add_interface(iface_n)
+    # info.write("P01" + " - Node:  " + nodes['5'].name + '\n')
+
+    # Create node monitor, it samples the tables of the Nodes in its own SimPy process
+    NodeMonitor(env, nodes)
+    # Add request for content
+    for con in consumers.values():
+        env.process(con.request("Trondheim/video"))
+        env.process(con.request("Trondheim/audio", 20))
+
+    # Run it
+    if quiescence:
+        detector = Quiescence(env, consumers.values(), list(nodes.values()) + list(producers.values()), 2000)
+        env.run(until=detector.stop)
+    else:
+        env.run(2000)
+
+    # # Visualization
+    # con_times = {}
+    # for name, consumer in consumers.items():
+    #     con_times[name] = consumer.receivedPackets.values()
+    # con_times = {name: list(consumer.receivedPackets.values())
+    #              for name, consumer in consumers.items()
+    #              if consumer.receivedPackets}
+    # fig_con = plt.figure(figsize=(10, 7))
+    # cons = {}
+    # if con_times:
+    #     cons = {name: {pkt.name: pkt.time for pkt in consumer} for name, consumer in con_times.items()}
+    #     out_consumer = pd.DataFrame(cons)
+    #     plot3 = out_consumer.plot.bar(title="Content access response time", ax=fig_con.add_subplot(111))
+    #     plot3.set(ylabel="Time", xlabel='Content name')
+    #     plot3.grid(axis='y')
+    #     plot3.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    #
+    # if con_times:
+    #     out_consumer.to_csv('data/' + output + '_times_' + str(simulation) + '.csv')
+    #
+    # fig_con.savefig('data/' + output + '_times_' + str(simulation) + ".png", bbox_inches='tight')
+    #
+    print(str(simulation))
+
+    result = SimulationResult(mode, simulation)
+    # amount of consumers per simularion
+    result.consumers = len(consumers)
+    # Amount of producers per simulation
+    result.producers = len(producers)
+    # Content retrieved per consumer
+    result.consumer_hits = [len(consumer.receivedPackets) for consumer in consumers.values()]
+    result.hits = sum(result.consumer_hits)
+    # Number of wasted packets
+    result.waste = (total(consumers.values(), 'wasted') + total(nodes.values(), 'wasted') +
+                    total(producers.values(), 'wasted'))
+    # Wasted ant packets in the interface
+    result.ant_iface = total((iface for node in nodes.values() for iface in node.interfaces), 'ant_waste')
+    # Wasted content packets in the interface
+    result.cnt_iface = total((iface for node in nodes.values() for iface in node.interfaces), 'content_waste')
+    # Content lost pga. the PIT entry was removed by timeout
+    result.timeouts = total(nodes.values(), 'timeout')
+    result.cs_hits = total(nodes.values(), 'cs_hits')
+    result.cs_misses = total(nodes.values(), 'cs_misses')
+    result.cs_evictions = total(nodes.values(), 'cs_evictions')
+    # Amount of interest packets lost
+    result.interests = total(nodes.values(), 'interest_drop')
+    # Sum total of different names received by the consumers
+    rec = set()
+    for produ in producers.values():
+        rec = rec.union(produ.received)
+    result.prod_rec = len(rec)
+    # Amount of requests made by the consumers
+    result.con_send = sum([len(con.sentPackets) for con in consumers.values()])
+    result.end = env.now
+    result.expired = sum(len(con.outstanding()) for con in consumers.values())
+
+    # Stretch regarding Shortest Path, computed at once for all the packets received by the consumers
+    received = [(con.name, pkt) for con in consumers.values() for pkt in con.receivedPackets.values()]
+    # Index of the name of each packet, in order of appearance
+    index = {}
+    name_idx = np.array([index.setdefault(pkt.name, len(index)) for con, pkt in received], dtype=np.int64)
+    # Calculate shortest path bw consumer and producer
+    sp = oracle.hops([con for con, pkt in received], [pkt.creator for con, pkt in received])
+    elapsed = np.array([pkt.time for con, pkt in received], dtype=np.float64)
+    hops = np.array([pkt.default_time - pkt.lifetime for con, pkt in received], dtype=np.int64)
+    count = np.bincount(name_idx, minlength=len(index))
+    # The packets carry name ids, the results are keyed by the names themselves
+    index = [registry.name(name) for name in index]
+
+    # List of names retrieved by consumers
+    # names_n = {}
+    # for con in consumers.values():
+    #     for pkt in con.receivedPackets.values():
+    #         if pkt.name not in names_n:
+    #             names_n[pkt.name] = 1
+    #         else:
+    #             names_n[pkt.name] += 1
+
+    # Average stretch in this simulation, stretch in hops compared to SP
+    result.stretch = dict(zip(index, (np.bincount(name_idx, hops / sp, len(index)) / count).tolist()))
+
+    # Average time per hop in this simulation
+    result.times = dict(zip(index, (np.bincount(name_idx, elapsed / (sp * 2), len(index)) / count).tolist()))
+
+    # Average time per name
+    result.content_times = dict(zip(index, (np.bincount(name_idx, elapsed, len(index)) / count).tolist()))
+    return result
 
 
 if __name__ == '__main__':
     # Mode 0 is Ant routing, mode 1 is flood routing
-    consum = []
+    # With the --quiescence flag a simulation ends as soon as the Consumers can not receive anything else, instead of
+    # running up to 2000. The flag can go anywhere, the other arguments are positional
+    quiescence = '--quiescence' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--quiescence']
+    # The amount of worker processes can be given as first argument, by default all the cores are used
+    processes = int(args[0]) if len(args) > 0 else None
+    # Replications are run until the 95 confidence intervals of the content retrieved per consumer and of the
+    # content time of each name are narrower than this fraction of their mean, second argument
+    precision = float(args[1]) if len(args) > 1 else 0.05
+    # If a warm up time is given as third argument, the network of each mode is run once up to it and all the
+    # replications are forked from it
+    warm_up = float(args[2]) if len(args) > 2 else None
     hits = {}
     hits_a = {}
     hits_c = {}
@@ -117,204 +300,82 @@ if __name__ == '__main__':
     con_send = {}
     total_stretch = {}
     total_times = {}
-    hit_c = {}
-    simulations = 0
+    simulations = 200  # Maximum amount of replications
+    confidence = 0.95
+    consum = {mode: [] for mode in range(2)}
+    prod = {mode: [] for mode in range(2)}
+    # Per name metrics of each mode, the replications are added as they finish
+    stats = {mode: Aggregator() for mode in range(2)}
+    # Both modes get the same topology and workload for a seed, the difference of each pair of replications is
+    # aggregated instead of comparing the two means, its confidence interval is narrower
+    pending = {}  # Content retrieved per consumer by the first mode finished, by replication
+    difference = OnlineStats()  # Ant routing minus flooding content retrieved per consumer
     for mode in range(2):
-        if mode == 0:
-            output = 'ant_1000/scenario6'
-        else:
-            output = 'flood_1000/scenario7'
-        consum = []
-        prod = []
         hits[mode] = []
         hits_a[mode] = []
         hits_c[mode] = []
         waste[mode] = []
-        hit_c[mode] = []
         timeouts[mode] = []
         inter[mode] = []
         prod_rec[mode] = []
         con_send[mode] = []
-        aver_stretch = []
-        aver_times = []
-        content_times = []  # List: for each simulation the average time of each name is saved
-        simulations = 200
-        for simulation in range(simulations):
-            random.seed(2200+simulation)
-            env = simpy.Environment()  # Create the SimPy environment
-            nodes = importTopology(env, 'isis-uninett.net', mode)
-            graph = printTopology('isis-uninett.net', nodes)
-            # Create Consumers
-            consumers = {}
-            for i in range(random.randint(20, 50)):
-                name = 'C'+str(i)
-                consumers[name] = Consumer(env, name, i*3+10, mode)
-                rand = random.choice(list(nodes.keys()))
-                iface_c = Interface(env, name + "-" + nodes[rand].name, consumers[name].store)
-                iface_n = Interface(env, nodes[rand].name + "-" + name, nodes[rand].store, iface_c)
-                iface_c.add_interface(iface_n)
-                nodes[rand].add_interface(iface_n)
-                consumers[name].add_interface(iface_c)
-                graph.add_edge(name, nodes[rand].name, value=1000000)
-                graph.add_edge(nodes[rand].name, name, value=1000000)
-            # Create Producer
-            names = ["video", "audio"]
-            # Generate a random number of producers (1-5) in a random location
-            producers = {}
-            for i in range(random.randint(2, 5)):
-                name = 'P'+str(i)
-                rand = random.choice(list(nodes.keys()))
-                while nodes[rand].area != 'Trondheim':
-                    rand = random.choice(list(nodes.keys()))
-                producers[name] = Producer(env, names, name, nodes[rand].area)
-                iface_p = Interface(env, name + "-" + nodes[rand].name, producers[name].store)
-                iface_n = Interface(env, nodes[rand].name + "-" + name, nodes[rand].store, iface_p)
-                iface_p.add_interface(iface_n)
-                nodes[rand].add_interface(iface_n)
-                producers[name].add_interface(iface_p)
-                graph.add_edge(name, nodes[rand].name, value=1000000)
-                graph.add_edge(nodes[rand].name, name, value=1000000)
-
-            # Create static Producer
-            # producer = Producer(env, names, "P01", "Trondheim")
-            # # 5 - hovedbygget
-            # node = nodes['5']
-            # iface_p = Interface(env, "P01" + "-" + node.name, producer.store)
-            # iface_n = Interface(env, node.name + "-" + "P01", node.store, iface_p)
-            # iface_p.add_interface(iface_n)
-            # producer.add_interface(iface_p)
-            # node.add_interface(iface_n)
-            # info.write("P01" + " - Node:  " + nodes['5'].name + '\n')
-
-            # Create node monitor
-            monitor_n = NodeMonitor(env, nodes)
-            # Add request for content
-            for con in consumers.values():
-                env.process(con.request("Trondheim/video"))
-                env.process(con.request("Trondheim/audio", 20))
-
-            # data = []
-            # monitor = functools.partial(monitor, data)
-            # trace(env, monitor)
-
-            # Run it
-            env.run(2000)
-
-            # Save events information to a file
-            # data_f = pd.DataFrame(data)
-            # data_f.to_csv('data/' + output + '_data_' + str(simulation) + '.csv')
-
-            # # Visualization
-            # con_times = {}
-            # for name, consumer in consumers.items():
-            #     con_times[name] = consumer.receivedPackets.values()
-            # con_times = {name: list(consumer.receivedPackets.values())
-            #              for name, consumer in consumers.items()
-            #              if consumer.receivedPackets}
-            # fig_con = plt.figure(figsize=(10, 7))
-            # cons = {}
-            # if con_times:
-            #     cons = {name: {pkt.name: pkt.time for pkt in consumer} for name, consumer in con_times.items()}
-            #     out_consumer = pd.DataFrame(cons)
-            #     plot3 = out_consumer.plot.bar(title="Content access response time", ax=fig_con.add_subplot(111))
-            #     plot3.set(ylabel="Time", xlabel='Content name')
-            #     plot3.grid(axis='y')
-            #     plot3.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-            #
-            # if con_times:
-            #     out_consumer.to_csv('data/' + output + '_times_' + str(simulation) + '.csv')
-            #
-            # fig_con.savefig('data/' + output + '_times_' + str(simulation) + ".png", bbox_inches='tight')
-            #
-            print(str(simulation))
-
-            # amount of consumers per simularion
-            consum.append(len(consumers))
-            # Amount of producers per simulation
-            prod.append(len(producers))
-            # Content retrieved per consumer
-            hit = sum(len(consumer.receivedPackets) for consumer in consumers.values())
-            #Append consumer hits for 95 confidence
-            hit_c[mode].append([len(consumer.receivedPackets) for consumer in consumers.values()])
-            # Append to higher list
-            hits[mode].append(hit)
-            # Append the average of content retrieved
-            hits_a[mode].append(hit / len(consumers))
-            # Append the number of wasted packets per simulation
-            waste[mode].append(sum(len(consumer.wastedPackets) for consumer in consumers.values()) +
-                               sum(len(node.wastedPackets) for node in nodes.values()) +
-                               sum(len(producer.wasted) for producer in producers.values()))
-            # Wasted ant packets in the interface
-            ant_iface = sum(len(iface.antWaste) for node in nodes.values() for iface in node.interfaces)
-            # Wasted content packets in the interface
-            cnt_iface = sum(len(iface.contentWaste) for node in nodes.values() for iface in node.interfaces)
-            # Content lost pga. the PIT entry was removed by timeout
-            timeouts[mode].append(sum(len(node.timeoutPackets) for node in nodes.values()))
-            # Amount of interest packets lost
-            inter[mode].append(sum(len(node.interestDrop) for node in nodes.values()))
-            # Sum total of different names received by the consumers
-            rec = set()
-            for produ in producers.values():
-                rec = rec.union(produ.received)
-            prod_rec[mode].append(len(rec))
-            # Amount of requests made by the consumers
-            con_send[mode].append(sum([len(con.sentPackets) for con in consumers.values()]))
-
-            # Stretch regarding Shortest Path
-            stretch = {}
-            # Time per hop
-            times = {}
-            # Times per name
-            times_name = {}
-            for con in consumers.values():
-                for pkt in con.receivedPackets.values():
-                    if pkt.name not in stretch:
-                        stretch[pkt.name] = []
-                    if pkt.name not in times:
-                        times[pkt.name] = []
-                    if pkt.name not in times_name:
-                        times_name[pkt.name] = []
-                    # Calculate shortest path bw consumer and producer
-                    sp = (len(nx.shortest_path(graph, con.name, pkt.creator)) - 1)
-                    # Time per hop
-                    times[pkt.name].append(pkt.time / (sp * 2))
-                    # Stretch in hops compared to SP
-                    stretch[pkt.name].append((pkt.default_time - pkt.lifetime) / sp)
-                    # Time for pkt name
-                    times_name[pkt.name].append(pkt.time)
-
-            # List of names retrieved by consumers
-            # names_n = {}
-            # for con in consumers.values():
-            #     for pkt in con.receivedPackets.values():
-            #         if pkt.name not in names_n:
-            #             names_n[pkt.name] = 1
-            #         else:
-            #             names_n[pkt.name] += 1
-
-            # Average stretch in this simulation
-            aver_stretch.append({name: sum(stretch[name]) / len(stretch[name])
-                                 for name in stretch.keys()})
-
-            # Average time per hope in this simulation
-            aver_times.append({name: sum(times[name]) / len(times[name])
-                               for name in times.keys()})
-
-            # Average time per name
-            content_times.append({name: sum(times_name[name]) / len(times_name[name])
-                                  for name in times_name.keys()})
-
-        names = [name for stretch in aver_stretch for name in stretch.keys()]
-
-        total_stretch[mode] = {name: sum(aver_stretch[i][name]
-                                         for i in range(simulations)
-                                         if name in aver_stretch[i]) / simulations
-                               for name in names}
-
-        total_times[mode] = {name: sum(aver_times[i][name]
-                                       for i in range(simulations)
-                                       if name in aver_times[i]) / simulations
-                             for name in names}
+
+    def fold(result):
+        # Reduce the replications in seed order
+        mode = result.mode
+        consum[mode].append(result.consumers)
+        prod[mode].append(result.producers)
+        hits[mode].append(result.hits)
+        hits_a[mode].append(result.hits / result.consumers)
+        stats[mode].add('hits_a', result.hits / result.consumers)
+        if result.simulation in pending:
+            pair = {mode: result.hits / result.consumers, 1 - mode: pending.pop(result.simulation)}
+            difference.add(pair[0] - pair[1])
+        else:
+            pending[result.simulation] = result.hits / result.consumers
+        # 95 confidence interval of the content retrieved per consumer in the simulation
+        consumer_hits = OnlineStats()
+        for consumer_hit in result.consumer_hits:
+            consumer_hits.add(consumer_hit)
+        hits_c[mode].append(consumer_hits.half_width(confidence))
+        waste[mode].append(result.waste)
+        timeouts[mode].append(result.timeouts)
+        inter[mode].append(result.interests)
+        prod_rec[mode].append(result.prod_rec)
+        con_send[mode].append(result.con_send)
+        stats[mode].update('stretch', result.stretch)
+        stats[mode].update('times', result.times)
+        # For each name the average time in each simulation
+        stats[mode].update('content_times', result.content_times)
+        stats[mode].add('end', result.end)
+
+    # Both modes are run with the same seeds
+    stop = TargetPrecision({'ant hits_a': (stats[0], 'hits_a'), 'ant content_times': (stats[0], 'content_times'),
+                            'flood hits_a': (stats[1], 'hits_a'), 'flood content_times': (stats[1], 'content_times')},
+                           precision, confidence)
+    # The time each simulation ended at is kept along with the results
+    if warm_up is None:
+        simulations = run_sequential(simulate,
+                                     lambda simulation: [(mode, simulation, 'dict', quiescence) for mode in range(2)],
+                                     fold, stop, simulations, processes)
+    else:
+        networks = {mode: WarmNetwork(mode, warm_up) for mode in range(2)}
+        simulations = run_sequential(simulate_warm,
+                                     lambda simulation: [(mode, simulation, quiescence) for mode in range(2)],
+                                     fold, stop, simulations, processes, state=networks)
+    print(stop.report())
+    print("Content retrieved per consumer, ant routing - flooding: {:.4f} +- {:.4f}".
+          format(difference.mean, difference.half_width(confidence)))
+
+    for mode in range(2):
+        if mode == 0:
+            output = 'ant_1000/scenario6'
+        else:
+            output = 'flood_1000/scenario7'
+
+        total_stretch[mode] = {name: total / simulations for name, total in stats[mode].totals('stretch').items()}
+
+        total_times[mode] = {name: total / simulations for name, total in stats[mode].totals('times').items()}
 
         # # Plot packets: retrieved and wasted
         # out_hits = pd.DataFrame({'hits': hits[mode], 'waste': waste[mode], 'timeout': timeouts[mode],
@@ -334,11 +395,7 @@ if __name__ == '__main__':
         # plot[0].get_figure().savefig('data/' + output + '_content.png', bbox_inches='tight')
 
         # Average content received per consumer
-        # Confidence content retrieval
-        # 95 confidence interval bw simulations - hit_c[mode][simulations]
-        confidence = 0.95
-        hits_c[mode] = [sem(hit_c[mode][s]) * t.ppf((1 + confidence) / 2, len(hit_c[mode][s]) - 1)
-                  for s in range(simulations)]
+        # Confidence content retrieval: hits_c, added along with each simulation
 
         # a_con = [hits[mode][i] / consum[i] for i in range(simulations)]
         # # Plot content retrieved
@@ -357,24 +414,11 @@ if __name__ == '__main__':
 
         # Average and confidence interval
 
-        # content_times -> list of dicts of name times
-        # names -> list of names
-        # Average time bw simulations
-        average_name_time = {name: sum(content_times[i][name]
-                                       for i in range(simulations)
-                                       if name in content_times[i]) /
-                                   len([i
-                                        for i in range(simulations)
-                                        if name in content_times[i]])
-                             for name in names}
+        # Average time bw simulations, over the simulations where the name was retrieved
+        average_name_time = stats[mode].means('content_times')
 
         # 95 confidence interval bw simulations
-        confidence = 0.95
-        n = len(names)
-        confidence_name_time = {name: sem([content_times[i][name]
-                                            for i in range(simulations)
-                                            if name in content_times[i]]) * t.ppf((1 + confidence) / 2, n - 1)
-                                 for name in names}
+        confidence_name_time = stats[mode].half_widths('content_times', confidence)
 
         # # Visualize average times with confidence interval
         # # Name times
@@ -393,6 +437,8 @@ if __name__ == '__main__':
         # plot3.legend().remove()
         # fig_con.savefig('data/' + output + '_confidence.png', bbox_inches='tight')
 
+    # Both modes use the same seeds, so the same amount of consumers
+    consum = consum[1]
     # Create dataframes for plotting
     out_hit = pd.DataFrame(hits, index=consum)
     out_prod = pd.DataFrame(prod_rec, index=consum)
@@ -1,10 +1,8 @@
-import functools
 import random
-import sys
-import time
 
 import simpy
 from components_uninett import Consumer, Producer, Node, Interface, NodeMonitor
+from topology import load_topology, build_network, build_graph
 import pandas as pd
 import matplotlib.pyplot as plt
 import networkx as nx
@@ -14,84 +12,16 @@ import networkx as nx
 """
 
 
-def trace(env, callback):
-    """Replace the ``step()`` method of *env* with a tracing function
-    that calls *callbacks* with an events time, priority, ID and its
-    instance just before it is processed.
-    """
-    def get_wrapper(env_step, callback):
-        """Generate the wrapper for env.step()."""
-        @functools.wraps(env_step)
-        def tracing_step():
-            """Call *callback* for the next event if one exist before
-            calling ``env.step()``."""
-            if len(env._queue):
-                t, prio, eid, event = env._queue[0]
-                callback(t, prio, eid, event)
-            return env_step()
-        return tracing_step
-    env.step = get_wrapper(env.step, callback)
-
-
-def monitor(data, t, prio, eid, event):
-    if not issubclass(type(event), simpy.events.Timeout):
-        data.append((t, eid, type(event), event.value))
-
-
 def importTopology(env, name):
-    nodes = {}
-    interfaces = {}
-    file = open(name, 'r')
-    line = file.readline()
-    while '*Vertices' not in line:
-        line = file.readline()
-    line = file.readline()
-    while '*Arcs' not in line:
-        words = line.split()
-        # Read nodes
-        nodes[words[0]] = Node(env, words[0], words[1][1:-1], words[5][1:-1])
-        line = file.readline()
-    line = file.readline()
-    while line is not '':
-        words = line.split()
-        # Read links
-        tupl = (words[1], words[0])
-        if tupl in interfaces:
-            iface = Interface(env, words[4], nodes[words[0]].store, interfaces[tupl], float(words[6]))
-            interfaces[tupl].add_interface(iface)
-        else:
-            iface = Interface(env, words[4], nodes[words[0]].store, rate=float(words[6]))
-
-        nodes[words[0]].add_interface(iface)
-        interfaces[(words[0], words[1])] = iface
-
-        line = file.readline()
+    # Returns the Nodes of the topology, built from the compiled topology
+    topology = load_topology(name)
+    nodes = build_network(env, topology, lambda nid, node, area: Node(env, nid, node, area), Interface)
     return nodes
 
 
 def printTopology(name, nodes):
-    file = open(name, 'r')
-    line = file.readline()
-    while '*Arcs' not in line:
-        #Skip nodes
-        line = file.readline()
-    line = file.readline()
-    dicc = {}
-    dicc['value'] = []
-    dicc['source'] = []
-    dicc['target'] = []
-    while line is not '':
-        words = line.split()
-        # Read links
-        dicc['source'].append(nodes[words[0]].name)
-        dicc['target'].append(nodes[words[1]].name)
-        dicc['value'].append(words[6])
-
-        line = file.readline()
-
     plt.figure(figsize=(20, 15))
-    df = pd.DataFrame(dicc)
-    g = nx.from_pandas_edgelist(df, 'source', 'target', create_using=nx.Graph())
+    g = nx.Graph(build_graph(load_topology(name)))
     nx.draw(g, with_labels=True, node_color='skyblue', node_size=35, edge_color="blue", width=2.0,
             edge_cmap=plt.get_cmap("winter"))
 
@@ -154,17 +84,9 @@ if __name__ == '__main__':
             env.process(con.request("Trondheim/video"))
             env.process(con.request("Trondheim/audio", 20))
 
-        # data = []
-        # monitor = functools.partial(monitor, data)
-        # trace(env, monitor)
-
         # Run it
         env.run(2000)
 
-        # Save events information to a file
-        # data_f = pd.DataFrame(data)
-        # data_f.to_csv('data/priority/scenario6_data_' + str(simulation) + '.csv')
-
         # # Visualization
         # con_times = {}
         # for name, consumer in consumers.items():
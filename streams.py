@@ -0,0 +1,128 @@
+import random
+import zlib
+
+import numpy as np
+
+"""
+    Random streams of a replication, one for each concern of the simulation.
+    Every concern draws from its own stream, seeded from the seed of the replication and the name of the concern, so
+    the draws of one concern do not depend on how many numbers the others used. Simulations run with the same seed
+    and different routing modes get the same topology and workload, and their results can be compared in pairs.
+    The streams can also be split by component, so the draws of a Node or a Consumer do not depend on the order the
+    events of the others are processed, and be backed by NumPy Generators drawing the numbers in blocks.
+"""
+
+CONCERNS = ('placement',  # Number and location of the Consumers and Producers
+            'workload',  # Identifiers of the packets and content of the Producers
+            'sizes',  # Size of the Interest and Data packets requested by the Consumers
+            'ants',  # Size of the ants, only sent when routing with ants
+            'forwarding',  # Choice of the outgoing interface
+            'evaporation')  # Time between two evaporation ticks
+
+
+class BlockRandom(object):
+    """ Generator with the methods of random.Random used by the components, backed by a NumPy Generator.
+
+        The uniforms and exponentials are drawn from the Generator in blocks and handed out one by one, so each number
+        costs a list access instead of a call to the Generator.
+
+        Parameters
+        ----------
+        seed : int, sequence or np.random.SeedSequence
+            seed of the NumPy Generator
+        block : int
+            amount of numbers drawn at once
+    """
+    def __init__(self, seed, block=1024):
+        self.generator = np.random.default_rng(seed)
+        self.block = block
+        self.uniforms = []  # Uniforms in [0, 1) not used yet
+        self.next_uniform = 0
+        self.exponentials = []  # Exponentials of rate 1 not used yet
+        self.next_exponential = 0
+
+    def random(self):
+        # Returns a uniform in [0, 1)
+        if self.next_uniform == len(self.uniforms):
+            self.uniforms = self.generator.random(self.block).tolist()
+            self.next_uniform = 0
+        value = self.uniforms[self.next_uniform]
+        self.next_uniform += 1
+        return value
+
+    def uniform(self, a, b):
+        # Same as a + (b - a) * self.random(), inlined as it is called on every forwarding decision
+        if self.next_uniform == len(self.uniforms):
+            self.uniforms = self.generator.random(self.block).tolist()
+            self.next_uniform = 0
+        value = self.uniforms[self.next_uniform]
+        self.next_uniform += 1
+        return a + (b - a) * value
+
+    def expovariate(self, lambd):
+        if self.next_exponential == len(self.exponentials):
+            self.exponentials = self.generator.standard_exponential(self.block).tolist()
+            self.next_exponential = 0
+        value = self.exponentials[self.next_exponential]
+        self.next_exponential += 1
+        return value / lambd
+
+    def randrange(self, stop):
+        return int(self.random() * stop)
+
+    def randint(self, a, b):
+        # Returns an integer in [a, b], both included
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    def choices(self, population, k=1):
+        return [population[int(self.random() * len(population))] for _ in range(k)]
+
+
+class Streams(object):
+    """ Independent generators by concern, as attributes (streams.placement, streams.sizes...).
+
+        Parameters
+        ----------
+        seed : int
+            seed of the replication, None uses the global random module for every concern
+        block : int
+            if given, the generators are BlockRandom drawing @block numbers at once, else random.Random
+        key : tuple
+            names of the component the streams belong to, empty for the ones of the whole replication
+    """
+    def __init__(self, seed=None, block=None, key=()):
+        self.seed = seed
+        self.block = block
+        self.key = key
+        for concern in CONCERNS:
+            setattr(self, concern, self.stream(concern))
+
+    def stream(self, concern):
+        # Returns a new generator for @concern, the same one for the same seed and key
+        if self.seed is None:
+            return random
+        if self.block:
+            spawn_key = tuple(_crc(name) for name in self.key + (concern,))
+            return BlockRandom(np.random.SeedSequence(self.seed, spawn_key=spawn_key), self.block)
+        # Seeding with a string hashes it, the seed is the same in every process and Python run
+        return random.Random("/".join(str(name) for name in (self.seed,) + self.key + (concern,)))
+
+    def component(self, name):
+        # Returns the streams of the component @name, independent from the ones of the other components
+        if self.seed is None:
+            return self
+        return Streams(self.seed, self.block, self.key + (name,))
+
+    def __repr__(self):
+        return "Streams: {} {}".format(self.seed, "/".join(str(name) for name in self.key))
+
+
+def _crc(name):
+    # Stable integer of a name, hash() of strings changes from one Python run to another
+    return zlib.crc32(str(name).encode())
+
+
+shared = Streams()  # Streams of the components created without their own, the global random module
@@ -0,0 +1,83 @@
+"""
+    Timers for the entries of the Node tables.
+    The times are integer ticks (the evaporation ticks of a Node), so expiring an entry does not need to scan the
+    whole table on every tick.
+"""
+
+
+class TimerWheel(object):
+    """ Hierarchical timer wheel.
+
+        Level 0 has a slot per tick for the next @slots ticks, level 1 a slot per @slots ticks and so on. Timers far
+        in the future wait in the higher levels and are moved down when their slot is reached, so scheduling and
+        firing a timer cost O(1) amortised.
+        Timers can not be cancelled: the callback receives the tick it was scheduled for and ignores it if the entry
+        has been refreshed or removed meanwhile.
+
+        Parameters
+        ----------
+        slots : int
+            slots per level
+        levels : int
+            amount of levels, timers further than slots ** levels ticks wait in the last level
+    """
+    def __init__(self, slots=64, levels=3):
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.current = 0  # Last tick processed
+        self.count = 0  # Timers waiting in the wheel
+
+    def __len__(self):
+        return self.count
+
+    def _insert(self, timer, earliest):
+        # Timers already due are fired on tick @earliest
+        tick = max(timer[0], earliest)
+        delta = tick - self.current
+        level = 0
+        width = 1
+        while level < self.levels - 1 and delta >= width * self.slots:
+            level += 1
+            width *= self.slots
+        self.wheels[level][(tick // width) % self.slots].append(timer)
+
+    def schedule(self, deadline, callback, key):
+        # Calls callback(key, deadline) on the tick @deadline, or on the next tick if it has already passed
+        self._insert((deadline, callback, key), self.current + 1)
+        self.count += 1
+
+    def advance(self, tick):
+        # Processes the ticks until @tick, firing the timers due
+        while self.current < tick:
+            if self.count == 0:
+                self.current = tick
+                return
+            self.current += 1
+            # Move down the timers of the higher levels whose slot starts now, from the top level down
+            width = self.slots ** (self.levels - 1)
+            for level in range(self.levels - 1, 0, -1):
+                if self.current % width == 0:
+                    index = (self.current // width) % self.slots
+                    slot = self.wheels[level][index]
+                    self.wheels[level][index] = []
+                    for timer in slot:
+                        self._insert(timer, self.current)
+                width //= self.slots
+            index = self.current % self.slots
+            slot = self.wheels[0][index]
+            self.wheels[0][index] = []
+            for timer in slot:
+                if timer[0] > self.current:
+                    # Only with a single level, timers further than a turn of the wheel wait for the next one
+                    self._insert(timer, self.current + 1)
+                else:
+                    self.count -= 1
+                    timer[1](timer[2], timer[0])
+
+    def clear(self):
+        # Drops all the timers
+        for wheel in self.wheels:
+            for index in range(self.slots):
+                wheel[index] = []
+        self.count = 0
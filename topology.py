@@ -0,0 +1,265 @@
+import hashlib
+import os
+import pickle
+
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+"""
+    Compiled version of a Pajek network file (isis-uninett.net).
+    The file is parsed once into an immutable Topology, which is cached on disk keyed by the hash of the file, and
+    the SimPy objects (Nodes and Interfaces) and the networkx graph used for the analysis are built from it.
+"""
+
+CACHE_VERSION = 2  # Increase it when the Topology format changes so old cache files are not used
+_loaded = dict()  # Topologies already loaded by this process, keyed by file hash
+
+
+class Topology(object):
+    """ Immutable description of a network.
+
+        Parameters
+        ----------
+        ids : tuple
+            identifier of each vertex as written in the file
+        names : tuple
+            name of each vertex
+        areas : tuple
+            area of each vertex
+        source : numpy array
+            index of the vertex where each arc starts
+        target : numpy array
+            index of the vertex where each arc ends
+        labels : tuple
+            label of each arc, used as the name of the Interface
+        rates : numpy array
+            rate of each arc
+        pairs : numpy array
+            index of the arc going in the opposite direction that the arc is attached to, -1 if there is none
+    """
+    def __init__(self, ids, names, areas, source, target, labels, rates, pairs):
+        self.ids = tuple(ids)
+        self.names = tuple(names)
+        self.areas = tuple(areas)
+        self.source = np.asarray(source, dtype=np.int32)
+        self.target = np.asarray(target, dtype=np.int32)
+        self.labels = tuple(labels)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self.pairs = np.asarray(pairs, dtype=np.int32)
+        self._distances = None
+        self.freeze()
+
+    def freeze(self):
+        for array in (self.source, self.target, self.rates, self.pairs):
+            array.flags.writeable = False
+
+    def __getstate__(self):
+        # The distance matrix is not cached on disk, it is cheap to compute again
+        state = self.__dict__.copy()
+        state['_distances'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.freeze()
+
+    def distances(self):
+        # Returns the matrix of hop distances between every pair of vertices, -1 if there is no path
+        # It is computed only the first time it is needed
+        if self._distances is None:
+            n = len(self.ids)
+            arcs = csr_matrix((np.ones(len(self.labels)), (self.source, self.target)), shape=(n, n))
+            hops = shortest_path(arcs, directed=True, unweighted=True)
+            hops[np.isinf(hops)] = -1
+            self._distances = hops.astype(np.int32)
+            self._distances.flags.writeable = False
+        return self._distances
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return "Topology: {} vertices, {} arcs".format(len(self.ids), len(self.labels))
+
+
+def parse_topology(name):
+    # Reads the Pajek file, the vertices are read until *Arcs and the arcs until the end of the file
+    ids = []
+    names = []
+    areas = []
+    index = dict()
+    source = []
+    target = []
+    labels = []
+    rates = []
+    pairs = []
+    last = dict()  # Last arc read for each (source, target)
+    with open(name, 'r') as file:
+        line = file.readline()
+        while '*Vertices' not in line:
+            line = file.readline()
+        line = file.readline()
+        while '*Arcs' not in line:
+            words = line.split()
+            # Read nodes
+            index[words[0]] = len(ids)
+            ids.append(words[0])
+            names.append(words[1][1:-1])
+            areas.append(words[5][1:-1])
+            line = file.readline()
+        line = file.readline()
+        while line != '':
+            words = line.split()
+            # Read links
+            src = index[words[0]]
+            dst = index[words[1]]
+            pairs.append(last.get((dst, src), -1))
+            last[(src, dst)] = len(labels)
+            source.append(src)
+            target.append(dst)
+            labels.append(words[4])
+            rates.append(float(words[6]))
+            line = file.readline()
+    return Topology(ids, names, areas, source, target, labels, rates, pairs)
+
+
+def load_topology(name, cache_dir=None):
+    # Returns the Topology of the file @name, parsing it only if it is not in memory nor in the cache directory
+    with open(name, 'rb') as file:
+        digest = hashlib.sha1(file.read()).hexdigest()
+    if digest in _loaded:
+        return _loaded[digest]
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(name)), '__pycache__')
+    path = os.path.join(cache_dir, "{}.{}.v{}.pickle".format(os.path.basename(name), digest, CACHE_VERSION))
+    topology = None
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as file:
+                topology = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            topology = None
+    if topology is None:
+        topology = parse_topology(name)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write to a temporary file first, several worker processes may be filling the cache at the same time
+            tmp = path + '.' + str(os.getpid())
+            with open(tmp, 'wb') as file:
+                pickle.dump(topology, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            print("Error - Topology cache could not be written in " + cache_dir)
+    _loaded[digest] = topology
+    return topology
+
+
+def shortest_routes(topology):
+    """ First hop of a shortest path from every vertex to the nearest vertex of each area.
+
+        The ties are broken by the order of the arcs in the file. The vertices get no route to their own area, nor to
+        the areas they can not reach.
+
+        Returns a dict keyed by vertex id, with a dict of the label of the arc to take for each area
+    """
+    distances = topology.distances()
+    areas = dict()  # Vertices of each area
+    for vertex, area in enumerate(topology.areas):
+        areas.setdefault(area, []).append(vertex)
+    arcs = [[] for _ in range(len(topology))]  # Arcs leaving each vertex, in file order
+    for arc, src in enumerate(topology.source.tolist()):
+        arcs[src].append(arc)
+    target = topology.target.tolist()
+    routes = dict()
+    for vertex, vid in enumerate(topology.ids):
+        routes[vid] = dict()
+        for area, members in areas.items():
+            if area == topology.areas[vertex]:
+                continue
+            hops = distances[vertex, members]
+            hops = hops[hops >= 0]
+            if not len(hops):
+                continue
+            # The next vertex is one hop closer to one of the nearest vertices of the area
+            nearest = hops.min()
+            for arc in arcs[vertex]:
+                if np.any(distances[target[arc], members] == nearest - 1):
+                    routes[vid][area] = topology.labels[arc]
+                    break
+    return routes
+
+
+def build_graph(topology):
+    # Returns the networkx DiGraph of the topology, keyed by node name
+    graph = nx.DiGraph()
+    for src, dst, rate in zip(topology.source.tolist(), topology.target.tolist(), topology.rates.tolist()):
+        graph.add_edge(topology.names[src], topology.names[dst], value=rate)
+    return graph
+
+
+def build_network(env, topology, node, interface):
+    """ Builds the SimPy objects of a Topology in a single pass over the arcs.
+
+        The networkx graph used for the analysis is built apart, by build_graph().
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            environment the Nodes and Interfaces are created in
+        topology : Topology
+            compiled topology
+        node : function
+            called as node(id, name, area) to create each Node
+        interface : class
+            Interface class, called as interface(env, name, store, iface, rate)
+
+        Returns the dict of Nodes keyed by vertex id
+    """
+    nodes = {}
+    vertices = []
+    for vid, name, area in zip(topology.ids, topology.names, topology.areas):
+        nodes[vid] = node(vid, name, area)
+        vertices.append(nodes[vid])
+    ifaces = []
+    for src, dst, label, rate, pair in zip(topology.source.tolist(), topology.target.tolist(), topology.labels,
+                                           topology.rates.tolist(), topology.pairs.tolist()):
+        if pair >= 0:
+            iface = interface(env, label, vertices[src].store, ifaces[pair], rate)
+            ifaces[pair].add_interface(iface)
+        else:
+            iface = interface(env, label, vertices[src].store, rate=rate)
+        vertices[src].add_interface(iface)
+        ifaces.append(iface)
+    return nodes
+
+
+class DistanceOracle(object):
+    """ Hop distances between the vertices of a Topology and the Consumers and Producers attached to them.
+
+        Parameters
+        ----------
+        topology : Topology
+            compiled topology, its distance matrix is shared by all the oracles
+    """
+    def __init__(self, topology):
+        self.distances = topology.distances()
+        self.index = {name: i for i, name in enumerate(topology.names)}  # Vertex of each node name
+        self.leaves = dict()  # Vertex each Consumer or Producer is attached to
+
+    def attach(self, name, node):
+        # Registers the Consumer or Producer @name as a leaf of the node named @node
+        self.leaves[name] = self.index[node]
+
+    def locate(self, name):
+        # Returns the vertex of @name and the amount of hops to get to it
+        if name in self.leaves:
+            return self.leaves[name], 1
+        return self.index[name], 0
+
+    def hops(self, sources, targets):
+        # Returns the array of shortest path lengths between each pair of names of @sources and @targets
+        src = np.array([self.locate(name) for name in sources], dtype=np.int64).reshape(-1, 2)
+        dst = np.array([self.locate(name) for name in targets], dtype=np.int64).reshape(-1, 2)
+        return self.distances[src[:, 0], dst[:, 0]] + src[:, 1] + dst[:, 1]
@@ -0,0 +1,167 @@
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from names import registry
+
+"""
+    Binary trace of the events processed by a SimPy environment.
+    Every event is saved as a fixed-width record (time, event type, node, name, packet), the records are buffered and
+    appended to the file in chunks as the simulation runs, so the memory used does not grow with the length of the
+    run. The names of the event types, nodes and contents are saved apart, in a JSON file next to the trace, when it
+    is closed. read_trace() maps the records into a NumPy array and trace_frame() builds a pandas DataFrame from them.
+"""
+
+RECORD = np.dtype([('time', '<f8'), ('event', '<u2'), ('node', '<i4'), ('name', '<i4'), ('packet', '<i8')])
+EVENT_TYPES = ('Other', 'Event', 'Timeout', 'Initialize', 'Interruption', 'Process', 'Condition', 'AllOf', 'AnyOf',
+               'StorePut', 'StoreGet', 'FilterStoreGet', 'Request', 'Release', 'ContainerPut', 'ContainerGet')
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+
+class EventTrace(object):
+    """ Trace of the events of a simulation written to a binary file.
+
+        Parameters
+        ----------
+        path : string
+            file the records are written to, it is overwritten
+        events : iterable
+            names of the event types traced (see EVENT_TYPES), all but Timeout by default
+        sample : dict
+            for some event types, only one of every sample[type] events is traced
+        chunk : int
+            records buffered before writing them to the file
+    """
+    def __init__(self, path, events=None, sample=None, chunk=65536):
+        self.path = path
+        if events is None:
+            events = [name for name in EVENT_TYPES if name != 'Timeout']
+        self.traced = [False] * len(EVENT_TYPES)  # Whether each event type is traced
+        for name in events:
+            self.traced[EVENT_CODES[name]] = True
+        self.every = [1] * len(EVENT_TYPES)  # One of every self.every[code] events is traced
+        for name, every in (sample or {}).items():
+            self.every[EVENT_CODES[name]] = max(int(every), 1)
+        self.seen = [0] * len(EVENT_TYPES)  # Events of each type processed so far
+        self.chunk = chunk
+        self.buffer = []
+        self.count = 0  # Records written
+        self.components = dict()  # Node id of each store watched, by store id
+        self.labels = []  # Name of each node id
+        self.file = open(path, 'wb')
+
+    def watch(self, component, label=None):
+        # Events of the stores of @component (a Node, Consumer or Producer and its interfaces) get a node id
+        # Returns the node id
+        nid = len(self.labels)
+        self.labels.append(label if label is not None else str(getattr(component, 'name', nid)))
+        self.components[id(component.store)] = nid
+        interfaces = getattr(component, 'interfaces', None)
+        if interfaces is None:
+            interface = getattr(component, 'interface', None)
+            interfaces = [interface] if interface is not None else []
+        for iface in interfaces:
+            self.components[id(iface.packets)] = nid
+        return nid
+
+    def attach(self, env):
+        # Replaces env.step() with a step tracing the next event before it is processed
+        env_step = env.step
+
+        @functools.wraps(env_step)
+        def tracing_step():
+            if env._queue:
+                t, prio, eid, event = env._queue[0]
+                self.record(t, event)
+            return env_step()
+
+        env.step = tracing_step
+        return self
+
+    def record(self, t, event):
+        code = EVENT_CODES.get(type(event).__name__, 0)
+        if not self.traced[code]:
+            return
+        self.seen[code] += 1
+        if self.every[code] > 1 and (self.seen[code] - 1) % self.every[code]:
+            return
+        # Store events carry the item put, or the item got once they are triggered
+        store = getattr(event, 'resource', None)
+        node = self.components.get(id(store), -1) if store is not None else -1
+        pkt = _packet(getattr(event, 'item', None) if code == EVENT_CODES['StorePut'] else event._value)
+        if pkt is not None:
+            name = pkt.name
+            if isinstance(name, str):  # Packets of the components still using string names
+                name = registry.intern(name)
+            self.buffer.append((t, code, node, name, pkt.id))
+        else:
+            self.buffer.append((t, code, node, -1, -1))
+        if len(self.buffer) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            np.array(self.buffer, dtype=RECORD).tofile(self.file)
+            self.count += len(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        # Writes the remaining records and the names needed to read them
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+        with open(_metadata(self.path), 'w') as file:
+            json.dump({'events': EVENT_TYPES, 'nodes': self.labels, 'names': registry.names,
+                       'records': self.count}, file)
+
+    def __len__(self):
+        return self.count + len(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _packet(item):
+    # Returns the packet in a store item (a packet, a list or tuple with a packet), None if there is none
+    if hasattr(item, 'id') and hasattr(item, 'name'):
+        return item
+    if isinstance(item, (list, tuple)):
+        for each in item:
+            if hasattr(each, 'id') and hasattr(each, 'name'):
+                return each
+    return None
+
+
+def _metadata(path):
+    return path + '.json'
+
+
+def read_trace(path, mmap=True):
+    # Returns the records of the trace @path as a NumPy structured array, mapped from the file if @mmap
+    if not os.path.getsize(path):
+        return np.zeros(0, dtype=RECORD)
+    if mmap:
+        return np.memmap(path, dtype=RECORD, mode='r')
+    return np.fromfile(path, dtype=RECORD)
+
+
+def trace_frame(path):
+    # Returns the trace @path as a pandas DataFrame, with the event types, nodes and names as strings
+    records = read_trace(path, mmap=False)
+    with open(_metadata(path), 'r') as file:
+        metadata = json.load(file)
+    nodes = np.array(metadata['nodes'] + [None], dtype=object)  # Id -1 is the last one, None
+    names = np.array(metadata['names'] + [None], dtype=object)
+    return pd.DataFrame({'time': records['time'],
+                         'event': pd.Categorical.from_codes(records['event'], metadata['events']),
+                         'node': nodes[records['node']],
+                         'name': names[records['name']],
+                         'packet': records['packet']})